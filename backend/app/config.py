@@ -1,13 +1,32 @@
-from pydantic_settings import BaseSettings
-from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import lru_cache
+from typing import List, Optional
 
 class Settings(BaseSettings):
     database_url: str
+    # Async (asyncpg) URL; derived from database_url when not set
+    database_url_async: Optional[str] = None
+    # Pool sizing for both engines; the async engine's statement caches are
+    # off so pgbouncer transaction pooling (e.g. Neon's -pooler endpoint) works
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 300
+    db_pool_timeout: int = 30
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    bcrypt_rounds: int = 12
+    redis_url: Optional[str] = None
+    # Internal nginx location aliased to the uploads directory; when set,
+    # large downloads are handed to nginx via X-Accel-Redirect
+    uploads_accel_redirect_prefix: Optional[str] = None
+    # Addresses of our own reverse proxies (JSON list in the environment);
+    # X-Forwarded-For / X-Real-IP are only honoured on connections from them
+    trusted_proxies: List[str] = []
     
-    class Config:
-        env_file = ".env"
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore", case_sensitive=False)
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load settings on first use and reuse them afterwards."""
+    return Settings()
\ No newline at end of file
@@ -1,16 +1,37 @@
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from .config import settings
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, registry, DeclarativeBase
+from .config import get_settings
+import orjson
+
+def _json_serializer(obj) -> str:
+    """Serialize JSON column values with orjson."""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+settings = get_settings()
 
 # Create SQLAlchemy engine
-engine = create_engine(settings.database_url)
+engine = create_engine(
+    settings.database_url,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=True,  # Replace connections the pooler or proxy has dropped
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads
+)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Shared mapper registry; mappers are configured once at startup
+mapper_registry = registry()
+
 # Create Base class
-Base = declarative_base()
+class Base(DeclarativeBase):
+    registry = mapper_registry
 
 # Dependency to get DB session
 def get_db():
@@ -18,4 +39,42 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _async_database_url() -> str:
+    """Build the asyncpg URL from database_url, translating libpq-only options."""
+    if settings.database_url_async:
+        return settings.database_url_async
+    
+    url = make_url(settings.database_url)
+    if url.get_backend_name() != "postgresql":
+        return settings.database_url
+    
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)  # Not understood by asyncpg
+    if sslmode:
+        query["ssl"] = sslmode
+    query["prepared_statement_cache_size"] = "0"
+    
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+# Async engine for endpoints that have moved to AsyncSession
+async_engine = create_async_engine(
+    _async_database_url(),
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=True,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    connect_args={"statement_cache_size": 0}
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,52 +1,122 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from .database import engine, Base
-from .models import User, Clinic, Patient, Document, Extraction
-from .routers import auth_router, users_router
+from sqlalchemy import text
+from .database import engine, async_engine, Base
+from .models import load_all_models
+from .models.audit_log import create_audit_log_partitions
+from .models.schema_upgrades import apply_column_upgrades, build_missing_indexes
+from .utils.file_handler import ensure_upload_dirs
+from .utils.audit import start_audit_writer, stop_audit_writer
+from .utils.auth import get_dummy_password_hash
+from .routers.auth import router as auth_router
+from .routers.users import router as users_router
 from .routers.documents import router as documents_router
 from .routers.patients import router as patients_router
-import os
+from .routers.uploads import router as uploads_router
+import asyncio
+import logging
+import orjson
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger("startup")
 
-# Create upload directory
-os.makedirs("uploads/documents", exist_ok=True)
+# Constant endpoint payloads, serialized once
+ROOT_PAYLOAD = orjson.dumps({"message": "Healthcare AI API is running"})
+HEALTH_PAYLOAD = orjson.dumps({"status": "healthy", "database": "connected"})
+
+# Postgres advisory lock held by the worker creating the schema
+SCHEMA_INIT_LOCK_ID = 0xC0FFEE
+
+def _init_database() -> None:
+    """Create or upgrade database tables, unless another worker is already doing it."""
+    use_lock = engine.dialect.name == "postgresql"
+    
+    with engine.connect() as conn:
+        if use_lock:
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEMA_INIT_LOCK_ID}
+            ).scalar()
+            if not acquired:
+                return
+        
+        try:
+            Base.metadata.create_all(bind=conn)
+            apply_column_upgrades(conn)
+            create_audit_log_partitions(conn)
+            conn.commit()
+            
+            # Indexes added to existing tables after they were created
+            build_missing_indexes(engine, Base.metadata)
+        finally:
+            if use_lock:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_INIT_LOCK_ID})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run one-time startup work before serving requests."""
+    logging.basicConfig(format="%(name)s %(message)s", level=logging.INFO)
+    
+    # Import models and resolve relationships once, before the first query
+    load_all_models()
+    Base.registry.configure()
+    
+    await asyncio.to_thread(_init_database)
+    
+    # Build the dummy login hash now rather than on the first failed login
+    await asyncio.to_thread(get_dummy_password_hash)
+    
+    # Upload directories live on each worker's filesystem, so every worker
+    # ensures them (one makedirs call per directory), logged as a single line
+    results = ensure_upload_dirs()
+    logger.info("upload_dirs_init %s", results, extra={"results": results})
+    
+    await start_audit_writer()
+    try:
+        yield
+    finally:
+        await stop_audit_writer()
+        await async_engine.dispose()
+
+def create_app() -> FastAPI:
+    """Build the FastAPI application."""
+    app = FastAPI(
+        title="Healthcare AI API",
+        description="Healthcare AI platform for medical document analysis",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
+    )
+    
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Include routers
+    app.include_router(auth_router)
+    app.include_router(users_router)
+    app.include_router(documents_router)
+    app.include_router(patients_router)
+    app.include_router(uploads_router)
+    
+    @app.get("/")
+    async def root():
+        return Response(ROOT_PAYLOAD, media_type="application/json")
+    
+    @app.get("/health")
+    async def health_check():
+        return Response(HEALTH_PAYLOAD, media_type="application/json")
+    
+    return app
 
 # Initialize FastAPI app
-app = FastAPI(
-    title="Healthcare AI API",
-    description="Healthcare AI platform for medical document analysis",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
-# Include routers
-app.include_router(auth_router)
-app.include_router(users_router)
-app.include_router(documents_router)
-app.include_router(patients_router)
-
-@app.get("/")
-async def root():
-    return {"message": "Healthcare AI API is running"}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "database": "connected"}
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,63 +1,116 @@
-import time
-from fastapi import Request, Response, HTTPException
+import logging
+import re
+from redis.exceptions import RedisError
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from ..utils.security import rate_limiter, get_client_ip
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils.security import rate_limiter, get_redis_rate_limiter, resolve_client_ip
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Security middleware for rate limiting and basic protection."""
+logger = logging.getLogger(__name__)
+
+# Rate limits per bucket: (max requests, window in seconds)
+RATE_LIMITS = {
+    "upload": (10, 3600),     # 10 uploads per hour
+    "auth": (30, 900),        # 30 login/register attempts per 15 minutes
+    "general": (1000, 3600),  # 1000 general requests per hour
+}
+
+# Path prefix -> bucket, resolved with a single precompiled match
+BUCKET_PREFIXES = {
+    "/documents/upload": "upload",
+    "/auth/login": "auth",
+    "/auth/register": "auth",
+}
+_BUCKET_RE = re.compile("^(" + "|".join(re.escape(prefix) for prefix in BUCKET_PREFIXES) + ")")
+
+# Credential attempts are POSTs; other requests under those prefixes
+# (e.g. CORS preflights) count as general traffic
+BUCKET_METHODS = {"auth": frozenset({"POST"})}
+
+# Methods that skip rate limiting
+UNLIMITED_METHODS = frozenset({"OPTIONS", "HEAD"})
+
+# Methods that skip the CSRF check
+CSRF_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Security headers added to every HTTP response
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", b"default-src 'self'"),
+]
+
+class CombinedSecurityApp:
+    """Rate limiting, CSRF check and security headers in one ASGI middleware.
     
-    async def dispatch(self, request: Request, call_next):
-        # Rate limiting
-        client_ip = get_client_ip(request)
+    Implemented as plain ASGI rather than BaseHTTPMiddleware so requests don't
+    pay for an extra task group and response stream per middleware.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Different limits for different endpoints
-        if request.url.path.startswith('/documents/upload'):
-            max_requests = 10  # 10 uploads per hour
-            window = 3600
-        elif request.url.path.startswith('/auth/'):
-            max_requests = 5   # 5 auth attempts per hour
-            window = 3600
-        else:
-            max_requests = 1000  # 1000 general requests per hour
-            window = 3600
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + SECURITY_HEADERS
+            await send(message)
         
-        if not rate_limiter.is_allowed(client_ip, max_requests, window):
-            return JSONResponse(
-                status_code=429,
-                content={"detail": "Rate limit exceeded"}
-            )
+        method = scope["method"]
+        path = scope["path"]
         
-        # Add security headers
-        response = await call_next(request)
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value
+                break
         
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        # Client IP, shared with get_client_ip() through request.state
+        client_ip = resolve_client_ip(scope)
+        scope.setdefault("state", {})["client_ip"] = client_ip
         
-        return response
-
-class CSRFMiddleware(BaseHTTPMiddleware):
-    """Basic CSRF protection for state-changing operations."""
-    
-    async def dispatch(self, request: Request, call_next):
-        # Skip CSRF check for safe methods
-        if request.method in ["GET", "HEAD", "OPTIONS"]:
-            return await call_next(request)
-        
-        # Skip for auth endpoints (handled by authentication)
-        if request.url.path.startswith('/auth/'):
-            return await call_next(request)
+        # Rate limiting
+        if method not in UNLIMITED_METHODS:
+            # Different limits for different endpoints
+            match = _BUCKET_RE.match(path)
+            bucket = BUCKET_PREFIXES[match.group(1)] if match else "general"
+            if bucket in BUCKET_METHODS and method not in BUCKET_METHODS[bucket]:
+                bucket = "general"
+            max_requests, window = RATE_LIMITS[bucket]
+            
+            # Prefer the shared Redis limiter so limits hold across workers; if
+            # Redis is down or slow, limit in-process rather than fail requests
+            allowed = None
+            redis_limiter = get_redis_rate_limiter()
+            if redis_limiter is not None:
+                try:
+                    allowed = await redis_limiter.is_allowed(client_ip, bucket, max_requests, window)
+                except RedisError:
+                    logger.warning("Redis rate limiter unavailable, using in-process limits", exc_info=True)
+            if allowed is None:
+                allowed = rate_limiter.is_allowed(f"{client_ip}:{bucket}", max_requests, window)
+            
+            if not allowed:
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Rate limit exceeded"}
+                )
+                await response(scope, receive, send_with_headers)
+                return
         
-        # Check for presence of authorization header (basic CSRF protection)
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return JSONResponse(
+        # Basic CSRF protection: state-changing requests outside /auth/ must
+        # carry an Authorization header
+        if method not in CSRF_SAFE_METHODS and not path.startswith("/auth/") and not authorization:
+            response = JSONResponse(
                 status_code=403,
                 content={"detail": "CSRF protection: Authorization header required"}
             )
+            await response(scope, receive, send_with_headers)
+            return
         
-        return await call_next(request)
\ No newline at end of file
+        await self.app(scope, receive, send_with_headers)
@@ -1,7 +1,28 @@
-from .user import User
-from .clinic import Clinic
-from .patient import Patient
-from .document import Document
-from .extraction import Extraction
+import importlib
 
-__all__ = ["User", "Clinic", "Patient", "Document", "Extraction"]
\ No newline at end of file
+# Model name -> module defining it. Models are imported on first
+# attribute access (PEP 562) instead of when the package is imported.
+_MODEL_MODULES = {
+    "User": ".user",
+    "Clinic": ".clinic",
+    "Patient": ".patient",
+    "Document": ".document",
+    "Extraction": ".extraction",
+    "AuditLog": ".audit_log",
+}
+
+__all__ = list(_MODEL_MODULES)
+
+def __getattr__(name):
+    module_name = _MODEL_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # Cache so later lookups skip __getattr__
+    return value
+
+def load_all_models() -> None:
+    """Import every model module so all tables are registered on Base.metadata."""
+    for module_name in dict.fromkeys(_MODEL_MODULES.values()):
+        importlib.import_module(module_name, __name__)
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, ForeignKey, JSON, CheckConstraint, Index, DDL, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from datetime import date, timedelta
 import enum
+import logging
 from ..database import Base
 
+logger = logging.getLogger(__name__)
+
 class AuditAction(enum.Enum):
     CREATE = "create"
     UPDATE = "update"
@@ -25,10 +31,50 @@ class AuditEntityType(enum.Enum):
     EXTRACTION = "extraction"
     SYSTEM = "system"
 
+class _EnumCode(TypeDecorator):
+    """Store a Python enum as a SmallInteger code (its position in the enum).
+    
+    New members must be appended to the enum so existing codes keep their meaning.
+    """
+    impl = SmallInteger
+    cache_ok = True
+    
+    def __init__(self, enum_class):
+        super().__init__()
+        self.enum_class = enum_class
+        self._members = tuple(enum_class)
+        self._codes = {member: code for code, member in enumerate(self._members)}
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, self.enum_class):
+            value = self.enum_class(value)
+        return self._codes[value]
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._members[value]
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        CheckConstraint(f"action BETWEEN 0 AND {len(AuditAction) - 1}", name="ck_audit_logs_action"),
+        CheckConstraint(f"entity_type BETWEEN 0 AND {len(AuditEntityType) - 1}", name="ck_audit_logs_entity_type"),
+        # Log listings filter by clinic/user/patient and order by newest first
+        Index(
+            "ix_audit_clinic_time", "clinic_id", "created_at",
+            postgresql_include=["action", "entity_type", "entity_id", "user_email"]
+        ),
+        Index("ix_audit_user_time", "user_id", "created_at"),
+        Index("ix_audit_patient_time", "patient_id", "created_at"),
+        Index("ix_audit_entity", "entity_type", "entity_id"),
+        # Monthly partitions on Postgres; the partition key must be part of the primary key
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     
     # User performing the action
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -36,8 +82,8 @@ class AuditLog(Base):
     user_role = Column(String, nullable=True)
     
     # Action details
-    action = Column(Enum(AuditAction), nullable=False)
-    entity_type = Column(Enum(AuditEntityType), nullable=False)
+    action = Column(_EnumCode(AuditAction), nullable=False)
+    entity_type = Column(_EnumCode(AuditEntityType), nullable=False)
     entity_id = Column(String, nullable=True)  # Store as string to handle different ID types
     entity_name = Column(String, nullable=True)  # Human-readable identifier
     
@@ -48,7 +94,7 @@ class AuditLog(Base):
     # Details
     description = Column(Text, nullable=False)
     changes = Column(JSON, nullable=True)  # Before/after values for updates
-    metadata = Column(JSON, nullable=True)  # Additional context
+    extra_metadata = Column("metadata", JSON, nullable=True)  # Additional context ("metadata" is reserved on models)
     
     # Request information
     ip_address = Column(String, nullable=True)
@@ -60,9 +106,38 @@ class AuditLog(Base):
     error_message = Column(Text, nullable=True)
     
     # Timestamp
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
     
     # Relationships
     user = relationship("User", back_populates="audit_logs", foreign_keys=[user_id])
     clinic = relationship("Clinic", foreign_keys=[clinic_id])
-    patient = relationship("Patient", foreign_keys=[patient_id])
\ No newline at end of file
+    patient = relationship("Patient", foreign_keys=[patient_id])
+
+# Catch-all partition so inserts never fail when a monthly partition is missing
+event.listen(
+    AuditLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT").execute_if(dialect="postgresql")
+)
+
+def create_audit_log_partitions(connection, months_ahead: int = 2) -> None:
+    """Create monthly audit_logs partitions from the current month to months_ahead months out.
+    
+    Safe to call repeatedly (startup or a scheduled job); existing partitions are skipped.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    
+    month = date.today().replace(day=1)
+    for _ in range(months_ahead + 1):
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        try:
+            with connection.begin_nested():
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS audit_logs_{month:%Y_%m} PARTITION OF audit_logs "
+                    f"FOR VALUES FROM ('{month}') TO ('{next_month}')"
+                ))
+        except DBAPIError as e:
+            # The default partition already holds rows for this month
+            logger.warning("Skipping audit_logs partition for %s: %s", f"{month:%Y-%m}", e)
+        month = next_month
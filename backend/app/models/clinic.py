@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Boolean
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -8,12 +8,13 @@ class Clinic(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
-    license_number = Column(String, unique=True, nullable=False)
+    license_number = Column(String(32), unique=True, nullable=False)
     address = Column(Text)
-    phone = Column(String)
-    email = Column(String)
+    phone = Column(String(32))
+    email = Column(String(254))  # RFC 5321 maximum
     admin_user_id = Column(Integer, ForeignKey("users.id"))
     is_active = Column(Boolean, default=True)
+    storage_used_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")  # Sum of document file sizes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
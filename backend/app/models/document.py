@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, BigInteger
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, BigInteger, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -20,6 +20,17 @@ class DocumentStatus(enum.Enum):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Per-patient document counts and latest upload lookups
+        Index("idx_documents_patient_upload_date", "patient_id", "upload_date"),
+        # Clinic document lists seek on (upload_date, id) within a clinic; the
+        # same index serves the dashboard's recent uploads and month counts
+        Index("ix_documents_clinic_upload_date_id", "clinic_id", "upload_date", "id"),
+        # Status-filtered lists in upload order, and status counts per clinic
+        Index("ix_documents_clinic_status_upload_date", "clinic_id", "status", "upload_date"),
+        # A patient's status counts and status-filtered document lists
+        Index("ix_documents_patient_status", "patient_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patients.id"))
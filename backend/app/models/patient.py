@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Date, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -12,17 +12,22 @@ class Gender(enum.Enum):
 
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (
+        # Clinic dashboard and patient lists: per-clinic counts, newest patients
+        # and the list's (created_at, id) keyset seek
+        Index("ix_patients_clinic_created_id", "clinic_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     clinic_id = Column(Integer, ForeignKey("clinics.id"))
-    patient_id = Column(String, unique=True, index=True)  # Hospital patient ID
+    patient_id = Column(String(32), unique=True, index=True)  # Hospital patient ID
     date_of_birth = Column(Date)
     gender = Column(Enum(Gender))
-    phone = Column(String)
+    phone = Column(String(32))
     address = Column(Text)
     emergency_contact_name = Column(String)
-    emergency_contact_phone = Column(String)
+    emergency_contact_phone = Column(String(32))
     medical_history = Column(Text)
     allergies = Column(Text)
     current_medications = Column(Text)
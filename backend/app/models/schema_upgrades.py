@@ -0,0 +1,121 @@
+from sqlalchemy import text
+import logging
+
+logger = logging.getLogger(__name__)
+
+# create_all only creates missing tables, so changes to tables that already
+# exist are applied here at startup. Every step checks the catalog first and
+# is skipped once applied, so this is safe to run on every start.
+
+def _column_exists(connection, table: str, column: str) -> bool:
+    return connection.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+    ), {"table": table, "column": column}).first() is not None
+
+def _add_clinic_storage_used(connection) -> None:
+    """Add clinics.storage_used_bytes, backfilled from the clinic's existing documents."""
+    if _column_exists(connection, "clinics", "storage_used_bytes"):
+        return
+    
+    connection.execute(text(
+        "ALTER TABLE clinics ADD COLUMN storage_used_bytes BIGINT NOT NULL DEFAULT 0"
+    ))
+    connection.execute(text(
+        "UPDATE clinics c SET storage_used_bytes = COALESCE("
+        "(SELECT SUM(d.file_size) FROM documents d WHERE d.clinic_id = c.id), 0)"
+    ))
+    logger.info("Added and backfilled clinics.storage_used_bytes")
+
+# Identifier and contact columns bounded after the tables were created
+BOUNDED_COLUMNS = {
+    ("clinics", "license_number"): 32,
+    ("clinics", "phone"): 32,
+    ("clinics", "email"): 254,
+    ("patients", "patient_id"): 32,
+    ("patients", "phone"): 32,
+    ("patients", "emergency_contact_phone"): 32,
+}
+
+def _bound_column_widths(connection) -> None:
+    """Narrow unbounded VARCHAR columns to their model widths."""
+    for (table, column), width in BOUNDED_COLUMNS.items():
+        current = connection.execute(text(
+            "SELECT character_maximum_length FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+        ), {"table": table, "column": column}).scalar()
+        if current == width:
+            continue
+        
+        # Narrowing fails on longer values; leave those columns for an operator
+        longest = connection.execute(text(f"SELECT MAX(length({column})) FROM {table}")).scalar()
+        if longest is not None and longest > width:
+            logger.warning(
+                "Not narrowing %s.%s to VARCHAR(%d): existing values are up to %d characters",
+                table, column, width, longest
+            )
+            continue
+        
+        connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE VARCHAR({width})"))
+        logger.info("Narrowed %s.%s to VARCHAR(%d)", table, column, width)
+
+# Column changes, applied in order in the caller's transaction
+COLUMN_UPGRADES = [
+    _bound_column_widths,
+    _add_clinic_storage_used,
+]
+
+def apply_column_upgrades(connection) -> None:
+    """Bring columns of tables created by an older schema up to the current models."""
+    if connection.dialect.name != "postgresql":
+        return
+    
+    for upgrade in COLUMN_UPGRADES:
+        upgrade(connection)
+
+# Tables whose indexes are kept in step with the models on existing
+# databases (audit_logs is partitioned, where CONCURRENTLY isn't supported)
+INDEXED_TABLES = ("patients", "documents")
+
+# Indexes replaced by wider ones in the models
+SUPERSEDED_INDEXES = (
+    "ix_patients_clinic_created",
+    "ix_documents_clinic_upload_date",
+    "ix_documents_clinic_status",
+)
+
+def build_missing_indexes(engine, metadata) -> None:
+    """Create model indexes missing from existing tables and drop superseded ones.
+    
+    Runs on an autocommit connection so every index is built CONCURRENTLY,
+    without blocking writes to the table while it builds.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    
+    indexes = [
+        index
+        for table_name in INDEXED_TABLES
+        for index in metadata.tables[table_name].indexes
+    ]
+    
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # A failed concurrent build leaves an invalid index that IF NOT EXISTS
+        # would skip over, so drop those and build them again
+        invalid = conn.execute(text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+        ), {"names": [index.name for index in indexes]}).scalars().all()
+        for name in invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        
+        for index in indexes:
+            columns = ", ".join(column.name for column in index.columns)
+            unique = "UNIQUE " if index.unique else ""
+            conn.execute(text(
+                f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index.name} "
+                f"ON {index.table.name} ({columns})"
+            ))
+        
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
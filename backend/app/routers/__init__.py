@@ -1,4 +1,18 @@
-from .auth import router as auth_router
-from .users import router as users_router
+import importlib
 
-__all__ = ["auth_router", "users_router"]
\ No newline at end of file
+# Router name -> module defining it, imported on first access (PEP 562)
+_ROUTER_MODULES = {
+    "auth_router": ".auth",
+    "users_router": ".users",
+}
+
+__all__ = list(_ROUTER_MODULES)
+
+def __getattr__(name):
+    module_name = _ROUTER_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = importlib.import_module(module_name, __name__).router
+    globals()[name] = value
+    return value
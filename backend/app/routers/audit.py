@@ -1,13 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, case, desc
 from typing import List, Optional
 from datetime import datetime, timedelta
 
 from ..database import get_db
 from ..models.audit_log import AuditLog, AuditAction, AuditEntityType
 from ..models.user import User, UserRole
-from ..models.clinic import Clinic
 from ..schemas.audit import (
     AuditLogResponse, AuditLogListResponse, AuditLogFilter, AuditLogStats
 )
@@ -34,7 +33,7 @@ async def get_audit_logs(
     """Get audit logs with filtering (role-based access)."""
     
     # Build base query
-    query = db.query(AuditLog).options(joinedload(AuditLog.user))
+    query = db.query(AuditLog)
     
     # Apply role-based filtering
     if current_user.role == UserRole.ADMIN:
@@ -42,7 +41,7 @@ async def get_audit_logs(
         pass
     elif current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
         # Clinic users can only see logs from their clinic
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+        clinic = current_user.clinic
         if clinic:
             query = query.filter(AuditLog.clinic_id == clinic.id)
         else:
@@ -77,12 +76,15 @@ async def get_audit_logs(
     if success is not None:
         query = query.filter(AuditLog.success == success)
     
-    # Get total count
-    total = query.count()
+    # Get total count; only the id column is selected, and the user join
+    # is added for the page itself
+    total = query.with_entities(func.count(AuditLog.id)).scalar()
     
     # Apply pagination and ordering
     offset = (page - 1) * per_page
-    logs = query.order_by(desc(AuditLog.created_at)).offset(offset).limit(per_page).all()
+    logs = query.options(joinedload(AuditLog.user)).order_by(
+        desc(AuditLog.created_at)
+    ).offset(offset).limit(per_page).all()
     
     return AuditLogListResponse(
         logs=[AuditLogResponse.from_orm(log) for log in logs],
@@ -104,11 +106,13 @@ async def get_audit_stats(
     week_start = now - timedelta(days=7)
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    # Basic counts
-    total_logs = db.query(AuditLog).count()
-    logs_today = db.query(AuditLog).filter(AuditLog.created_at >= today_start).count()
-    logs_this_week = db.query(AuditLog).filter(AuditLog.created_at >= week_start).count()
-    logs_this_month = db.query(AuditLog).filter(AuditLog.created_at >= month_start).count()
+    # Basic counts, as plain count() expressions rather than wrapped subqueries
+    total_logs, logs_today, logs_this_week, logs_this_month = db.query(
+        func.count(AuditLog.id),
+        func.count(case((AuditLog.created_at >= today_start, 1))),
+        func.count(case((AuditLog.created_at >= week_start, 1))),
+        func.count(case((AuditLog.created_at >= month_start, 1)))
+    ).one()
     
     # Top actions
     top_actions_query = db.query(
@@ -151,7 +155,7 @@ async def get_my_activity(
     query = db.query(AuditLog).filter(AuditLog.user_id == current_user.id)
     
     # Get total count
-    total = query.count()
+    total = query.with_entities(func.count(AuditLog.id)).scalar()
     
     # Apply pagination
     offset = (page - 1) * per_page
@@ -167,14 +171,13 @@ async def get_my_activity(
 @router.post("/test")
 async def create_test_audit_log(
     request: Request,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a test audit log entry (for testing purposes)."""
     
-    audit_logger = get_audit_logger(db)
+    audit_logger = get_audit_logger()
     
-    audit_log = audit_logger.log_user_action(
+    audit_logger.log_user_action(
         action=AuditAction.VIEW,
         user=current_user,
         description="Test audit log created via API",
@@ -182,4 +185,4 @@ async def create_test_audit_log(
         metadata={"test": True, "endpoint": "/audit/test"}
     )
     
-    return {"message": "Test audit log created", "audit_log_id": audit_log.id}
\ No newline at end of file
+    return {"message": "Test audit log queued"}
\ No newline at end of file
@@ -1,34 +1,57 @@
 from datetime import timedelta
+from typing import NamedTuple, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..models.user import User,UserRole
 from ..models.clinic import Clinic
+from ..models.patient import Patient
 from ..schemas.auth import LoginRequest, RegisterRequest
 from ..schemas.user import Token, UserResponse
-from ..utils.auth import verify_password, get_password_hash, create_access_token
+from ..utils.auth import (
+    verify_password_async, get_password_hash_async, get_dummy_password_hash,
+    create_access_token, login_user_cache
+)
 from ..utils.deps import get_current_active_user
-from ..config import settings
+from ..config import Settings, get_settings
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+class _LoginUser(NamedTuple):
+    """Fields the login endpoints need; the profile part is cached briefly per email."""
+    email: str
+    hashed_password: str
+    is_active: bool
+    profile: UserResponse
+    patient_id: Optional[int]
+
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_data: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register a new user."""
     # Check if user exists
-    db_user = db.query(User).filter(User.email == user_data.email).first()
+    db_user = await db.scalar(select(User).where(User.email == user_data.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
+    # Clinic admins must register their clinic too
+    if user_data.role == UserRole.CLINIC_ADMIN:
+        if not user_data.clinic_name or not user_data.clinic_license:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Clinic name and license required for clinic admin"
+            )
+    
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -36,37 +59,46 @@ async def register(
         last_name=user_data.last_name,
         role=user_data.role
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
     
-    # Create clinic if user is clinic admin
-    if user_data.role == UserRole.CLINIC_ADMIN:
-        if not user_data.clinic_name or not user_data.clinic_license:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Clinic name and license required for clinic admin"
+    # User and clinic are written in one transaction with a single commit;
+    # flush assigns the user id (and created_at via RETURNING) without committing
+    try:
+        db.add(db_user)
+        await db.flush()
+        
+        # Create clinic if user is clinic admin
+        if user_data.role == UserRole.CLINIC_ADMIN:
+            db_clinic = Clinic(
+                name=user_data.clinic_name,
+                license_number=user_data.clinic_license,
+                admin_user_id=db_user.id
             )
+            db.add(db_clinic)
         
-        db_clinic = Clinic(
-            name=user_data.clinic_name,
-            license_number=user_data.clinic_license,
-            admin_user_id=db_user.id
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email or clinic license already registered"
         )
-        db.add(db_clinic)
-        db.commit()
     
-    return UserResponse.from_orm(db_user)
+    return UserResponse.from_orm_fast(db_user)
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    settings: Settings = Depends(get_settings)
 ):
     """Authenticate user and return access token."""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await _get_login_user(db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Always run bcrypt so unknown emails aren't distinguishable by response time
+    hashed_password = user.hashed_password if user else get_dummy_password_hash()
+    password_ok = await verify_password_async(form_data.password, hashed_password)
+    
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -81,25 +113,30 @@ async def login(
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=_token_claims(user), expires_delta=access_token_expires
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "expires_in": settings.access_token_expire_minutes * 60,
-        "user": UserResponse.from_orm(user)
+        "user": user.profile
     }
 
 @router.post("/login/json", response_model=Token)
 async def login_json(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    settings: Settings = Depends(get_settings)
 ):
     """JSON login endpoint for frontend."""
-    user = db.query(User).filter(User.email == login_data.email).first()
+    user = await _get_login_user(db, login_data.email)
+    
+    # Always run bcrypt so unknown emails aren't distinguishable by response time
+    hashed_password = user.hashed_password if user else get_dummy_password_hash()
+    password_ok = await verify_password_async(login_data.password, hashed_password)
     
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -113,14 +150,14 @@ async def login_json(
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=_token_claims(user), expires_delta=access_token_expires
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "expires_in": settings.access_token_expire_minutes * 60,
-        "user": UserResponse.from_orm(user)
+        "user": user.profile
     }
 
 @router.get("/me", response_model=UserResponse)
@@ -128,4 +165,40 @@ async def get_current_user_profile(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get current user profile."""
-    return UserResponse.from_orm(current_user)
\ No newline at end of file
+    return UserResponse.from_orm_fast(current_user)
+
+async def _get_login_user(db: AsyncSession, email: str) -> Optional[_LoginUser]:
+    """Look up a user for login, reusing a recent profile lookup for the same email."""
+    # The password hash and active flag are read on every attempt, so a
+    # deactivation or password change made through any worker applies at once
+    credentials = (await db.execute(
+        select(User.id, User.hashed_password, User.is_active).where(User.email == email)
+    )).first()
+    if credentials is None:
+        return None
+    
+    cached = login_user_cache.get(email)
+    if cached is None or cached[0].id != credentials.id:
+        user = await db.get(User, credentials.id)
+        
+        # Patients' profile id goes into their token so document checks don't
+        # have to look it up on every request
+        patient_id = None
+        if user.role == UserRole.PATIENT:
+            patient_id = await db.scalar(select(Patient.id).where(Patient.user_id == user.id).limit(1))
+        
+        cached = (UserResponse.from_orm_fast(user), patient_id)
+        login_user_cache.set(email, cached)
+    
+    profile, patient_id = cached
+    if profile.is_active != credentials.is_active:
+        profile = profile.model_copy(update={"is_active": credentials.is_active})
+    
+    return _LoginUser(email, credentials.hashed_password, credentials.is_active, profile, patient_id)
+
+def _token_claims(user: _LoginUser) -> dict:
+    """Claims for a user's access token."""
+    claims = {"sub": user.email}
+    if user.patient_id is not None:
+        claims["patient_id"] = user.patient_id
+    return claims
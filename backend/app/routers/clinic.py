@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, case, desc, literal, select, union_all
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models.clinic import Clinic
 from ..models.patient import Patient, Gender
 from ..models.document import Document, DocumentType, DocumentStatus
@@ -12,34 +13,29 @@ from ..models.user import User, UserRole
 from ..schemas.clinic import (
     ClinicResponse, ClinicUpdate, ClinicDashboardStats, ClinicOverview
 )
-from ..utils.deps import get_current_active_user, require_clinic_access
+from ..utils.cache import get_cached_clinic_stats, set_cached_clinic_stats
+from ..utils.deps import ClinicContext, get_clinic_context
+from ..utils.demographics import age_bucket_columns
 
 router = APIRouter(prefix="/clinic", tags=["clinic"])
 
 @router.get("/profile", response_model=ClinicResponse)
 async def get_clinic_profile(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_clinic_access)
+    ctx: ClinicContext = Depends(get_clinic_context)
 ):
     """Get current clinic profile."""
-    
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-    if not clinic:
-        raise HTTPException(status_code=404, detail="Clinic not found")
-    
-    return ClinicResponse.from_orm(clinic)
+    return ClinicResponse.from_orm(ctx.clinic)
 
 @router.put("/profile", response_model=ClinicResponse)
 async def update_clinic_profile(
     clinic_update: ClinicUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_clinic_access)
+    ctx: ClinicContext = Depends(get_clinic_context)
 ):
     """Update clinic profile."""
     
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-    if not clinic:
-        raise HTTPException(status_code=404, detail="Clinic not found")
+    # The clinic belongs to the request's sync session, which loaded the user
+    clinic = ctx.clinic
     
     # Update fields
     update_data = clinic_update.dict(exclude_unset=True)
@@ -53,197 +49,187 @@ async def update_clinic_profile(
 
 @router.get("/dashboard", response_model=ClinicDashboardStats)
 async def get_clinic_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_clinic_access)
+    db: AsyncSession = Depends(get_async_db),
+    ctx: ClinicContext = Depends(get_clinic_context)
 ):
     """Get comprehensive clinic dashboard statistics."""
+    return await _get_dashboard_stats(ctx.clinic, db)
+
+@router.get("/overview", response_model=ClinicOverview)
+async def get_clinic_overview(
+    db: AsyncSession = Depends(get_async_db),
+    ctx: ClinicContext = Depends(get_clinic_context)
+):
+    """Get complete clinic overview for dashboard."""
+    
+    # Both payloads come from the clinic resolved by the dependency
+    clinic_info = ClinicResponse.from_orm(ctx.clinic)
+    stats = await _get_dashboard_stats(ctx.clinic, db)
+    
+    quick_actions = [
+        {"title": "Add Patient", "action": "create_patient", "icon": "user-plus"},
+        {"title": "Upload Documents", "action": "upload_documents", "icon": "upload"},
+        {"title": "View Reports", "action": "view_reports", "icon": "chart-bar"},
+        {"title": "Clinic Settings", "action": "clinic_settings", "icon": "cog"},
+    ]
     
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-    if not clinic:
-        raise HTTPException(status_code=404, detail="Clinic not found")
+    return ClinicOverview(
+        clinic_info=clinic_info,
+        stats=stats,
+        quick_actions=quick_actions
+    )
+
+async def _get_dashboard_stats(clinic: Clinic, db: AsyncSession) -> ClinicDashboardStats:
+    """Get dashboard statistics, served from the Redis cache when fresh."""
+    cached = await get_cached_clinic_stats("dashboard", clinic.id)
+    if cached is not None:
+        return ClinicDashboardStats(**cached)
+    
+    stats = await _build_dashboard_stats(clinic, db)
+    await set_cached_clinic_stats("dashboard", clinic.id, stats.dict())
+    return stats
+
+async def _build_dashboard_stats(clinic: Clinic, db: AsyncSession) -> ClinicDashboardStats:
+    """Build dashboard statistics for an already-loaded clinic."""
     
     # Time ranges
     now = datetime.now()
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    week_start = now - timedelta(days=7)
-    
-    # Basic counts
-    total_patients = db.query(Patient).filter(Patient.clinic_id == clinic.id).count()
-    total_documents = db.query(Document).filter(Document.clinic_id == clinic.id).count()
-    
-    # This month stats
-    patients_this_month = db.query(Patient).filter(
-        Patient.clinic_id == clinic.id,
-        Patient.created_at >= month_start
-    ).count()
-    
-    documents_this_month = db.query(Document).filter(
-        Document.clinic_id == clinic.id,
-        Document.upload_date >= month_start
-    ).count()
-    
-    # Storage calculation
-    storage_used = db.query(func.sum(Document.file_size)).filter(
-        Document.clinic_id == clinic.id
-    ).scalar() or 0
-    
-    # Processing queue
-    processing_queue = db.query(Document).filter(
-        Document.clinic_id == clinic.id,
-        Document.status.in_([DocumentStatus.UPLOADED, DocumentStatus.PROCESSING])
-    ).count()
+    
+    # Patient and document aggregates: one pass over each table, one round trip
+    patient_stats = select(
+        func.count(Patient.id).label("total_patients"),
+        func.count(case((Patient.created_at >= month_start, 1))).label("patients_this_month")
+    ).where(Patient.clinic_id == clinic.id).cte("patient_stats")
+    
+    document_stats = select(
+        func.count(Document.id).label("total_documents"),
+        func.count(case((Document.upload_date >= month_start, 1))).label("documents_this_month"),
+        func.count(case((
+            Document.status.in_([DocumentStatus.UPLOADED, DocumentStatus.PROCESSING]), 1
+        ))).label("processing_queue"),
+        func.count(case((Document.status == DocumentStatus.UPLOADED, 1))).label("unprocessed"),
+        func.count(case((Document.status == DocumentStatus.FAILED, 1))).label("failed")
+    ).where(Document.clinic_id == clinic.id).cte("document_stats")
+    
+    counts = (await db.execute(select(patient_stats, document_stats))).one()
     
     # Recent activity
-    recent_activity = _get_recent_activity(clinic.id, db, limit=10)
+    recent_activity = await _get_recent_activity(clinic.id, db, limit=10)
     
     # Popular document types
-    doc_type_stats = db.query(
-        Document.document_type, 
-        func.count(Document.id)
-    ).filter(
-        Document.clinic_id == clinic.id
-    ).group_by(Document.document_type).all()
+    doc_type_stats = (await db.execute(
+        select(Document.document_type, func.count(Document.id))
+        .where(Document.clinic_id == clinic.id)
+        .group_by(Document.document_type)
+    )).all()
     
     popular_document_types = {
         doc_type.value: count for doc_type, count in doc_type_stats
     }
     
     # Patient demographics
-    patient_demographics = _get_patient_demographics(clinic.id, db)
+    patient_demographics = await _get_patient_demographics(clinic.id, db)
     
     # System alerts
-    system_alerts = _get_system_alerts(clinic.id, db)
+    system_alerts = _get_system_alerts(counts.failed, clinic.storage_used_bytes, counts.unprocessed)
     
     return ClinicDashboardStats(
-        total_patients=total_patients,
-        total_documents=total_documents,
-        documents_this_month=documents_this_month,
-        patients_this_month=patients_this_month,
-        storage_used=storage_used,
-        processing_queue=processing_queue,
+        total_patients=counts.total_patients,
+        total_documents=counts.total_documents,
+        documents_this_month=counts.documents_this_month,
+        patients_this_month=counts.patients_this_month,
+        storage_used=clinic.storage_used_bytes,
+        processing_queue=counts.processing_queue,
         recent_activity=recent_activity,
         popular_document_types=popular_document_types,
         patient_demographics=patient_demographics,
         system_alerts=system_alerts
     )
 
-@router.get("/overview", response_model=ClinicOverview)
-async def get_clinic_overview(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_clinic_access)
-):
-    """Get complete clinic overview for dashboard."""
-    
-    clinic_info = await get_clinic_profile(db, current_user)
-    stats = await get_clinic_dashboard_stats(db, current_user)
-    
-    quick_actions = [
-        {"title": "Add Patient", "action": "create_patient", "icon": "user-plus"},
-        {"title": "Upload Documents", "action": "upload_documents", "icon": "upload"},
-        {"title": "View Reports", "action": "view_reports", "icon": "chart-bar"},
-        {"title": "Clinic Settings", "action": "clinic_settings", "icon": "cog"},
-    ]
-    
-    return ClinicOverview(
-        clinic_info=clinic_info,
-        stats=stats,
-        quick_actions=quick_actions
-    )
+# Activity type -> (title prefix, icon, color)
+ACTIVITY_DISPLAY = {
+    "patient_registered": ("New patient registered", "user-plus", "green"),
+    "document_uploaded": ("Document uploaded", "document", "blue"),
+}
 
-def _get_recent_activity(clinic_id: int, db: Session, limit: int = 10) -> List[Dict[str, Any]]:
+async def _get_recent_activity(clinic_id: int, db: AsyncSession, limit: int = 10) -> List[Dict[str, Any]]:
     """Get recent clinic activity."""
     
-    activities = []
-    
-    # Recent patient registrations
-    recent_patients = db.query(Patient).filter(
-        Patient.clinic_id == clinic_id
-    ).order_by(Patient.created_at.desc()).limit(5).all()
-    
-    for patient in recent_patients:
-        activities.append({
-            "type": "patient_registered",
-            "title": f"New patient registered: {patient.patient_id}",
-            "timestamp": patient.created_at,
-            "icon": "user-plus",
-            "color": "green"
-        })
-    
-    # Recent document uploads
-    recent_documents = db.query(Document).filter(
-        Document.clinic_id == clinic_id
-    ).order_by(Document.upload_date.desc()).limit(5).all()
+    # Patient registrations and document uploads, merged and ordered by the database
+    recent_patients = select(
+        literal("patient_registered").label("type"),
+        Patient.patient_id.label("label"),
+        Patient.created_at.label("timestamp")
+    ).where(Patient.clinic_id == clinic_id)
+    
+    recent_documents = select(
+        literal("document_uploaded").label("type"),
+        Document.original_filename.label("label"),
+        Document.upload_date.label("timestamp")
+    ).where(Document.clinic_id == clinic_id)
+    
+    rows = (await db.execute(
+        union_all(recent_patients, recent_documents)
+        .order_by(desc("timestamp"))
+        .limit(limit)
+    )).all()
     
-    for doc in recent_documents:
+    activities = []
+    for row in rows:
+        title, icon, color = ACTIVITY_DISPLAY[row.type]
         activities.append({
-            "type": "document_uploaded",
-            "title": f"Document uploaded: {doc.original_filename}",
-            "timestamp": doc.upload_date,
-            "icon": "document",
-            "color": "blue"
+            "type": row.type,
+            "title": f"{title}: {row.label}",
+            "timestamp": row.timestamp,
+            "icon": icon,
+            "color": color
         })
     
-    # Sort by timestamp and limit
-    activities.sort(key=lambda x: x["timestamp"], reverse=True)
-    return activities[:limit]
+    return activities
+
+# Age buckets as (label, oldest age in the bucket); the last bucket is open-ended
+AGE_BUCKETS = [("0-18", 18), ("19-35", 35), ("36-55", 55), ("56-70", 70), ("71+", None)]
 
-def _get_patient_demographics(clinic_id: int, db: Session) -> Dict[str, Any]:
+async def _get_patient_demographics(clinic_id: int, db: AsyncSession) -> Dict[str, Any]:
     """Get patient demographic breakdown."""
     
-    # Gender distribution
-    gender_stats = db.query(Patient.gender, func.count(Patient.id)).filter(
-        Patient.clinic_id == clinic_id
-    ).group_by(Patient.gender).all()
+    age_columns = age_bucket_columns(AGE_BUCKETS)
+    
+    gender_columns = [
+        func.count(case((Patient.gender == gender, 1))).label(gender.value)
+        for gender in Gender
+    ]
     
+    # Gender counts, age buckets and the age-data total in one statement
+    row = (await db.execute(
+        select(
+            *gender_columns,
+            func.count(case((Patient.gender.is_(None), 1))).label("not_specified"),
+            *age_columns,
+            func.count(Patient.date_of_birth).label("total_with_age_data")
+        ).where(Patient.clinic_id == clinic_id)
+    )).one()._mapping
+    
+    gender_labels = [gender.value for gender in Gender] + ["not_specified"]
     gender_distribution = {
-        str(gender.value) if gender else 'not_specified': count 
-        for gender, count in gender_stats
+        label: row[label] for label in gender_labels if row[label]
     }
     
-    # Age distribution
-    from datetime import date
-    today = date.today()
-    age_groups = {'0-18': 0, '19-35': 0, '36-55': 0, '56-70': 0, '71+': 0}
-    
-    patients_with_dob = db.query(Patient).filter(
-        Patient.clinic_id == clinic_id,
-        Patient.date_of_birth.isnot(None)
-    ).all()
-    
-    for patient in patients_with_dob:
-        age = today.year - patient.date_of_birth.year
-        if patient.date_of_birth.month > today.month or \
-           (patient.date_of_birth.month == today.month and patient.date_of_birth.day > today.day):
-            age -= 1
-        
-        if age <= 18:
-            age_groups['0-18'] += 1
-        elif age <= 35:
-            age_groups['19-35'] += 1
-        elif age <= 55:
-            age_groups['36-55'] += 1
-        elif age <= 70:
-            age_groups['56-70'] += 1
-        else:
-            age_groups['71+'] += 1
+    age_groups = {label: row[label] for label, _ in AGE_BUCKETS}
     
     return {
         "gender_distribution": gender_distribution,
         "age_distribution": age_groups,
-        "total_with_age_data": len(patients_with_dob)
+        "total_with_age_data": row["total_with_age_data"]
     }
 
-def _get_system_alerts(clinic_id: int, db: Session) -> List[Dict[str, Any]]:
-    """Get system alerts and notifications."""
+def _get_system_alerts(failed_docs: int, storage_used: int, unprocessed: int) -> List[Dict[str, Any]]:
+    """Build system alerts from the dashboard's document counts."""
     
     alerts = []
     
     # Check for failed document processing
-    failed_docs = db.query(Document).filter(
-        Document.clinic_id == clinic_id,
-        Document.status == DocumentStatus.FAILED
-    ).count()
-    
     if failed_docs > 0:
         alerts.append({
             "type": "warning",
@@ -253,10 +239,6 @@ def _get_system_alerts(clinic_id: int, db: Session) -> List[Dict[str, Any]]:
         })
     
     # Check storage usage (if over 80% of some limit)
-    storage_used = db.query(func.sum(Document.file_size)).filter(
-        Document.clinic_id == clinic_id
-    ).scalar() or 0
-    
     storage_limit = 5 * 1024 * 1024 * 1024  # 5GB limit
     if storage_used > storage_limit * 0.8:
         alerts.append({
@@ -267,11 +249,6 @@ def _get_system_alerts(clinic_id: int, db: Session) -> List[Dict[str, Any]]:
         })
     
     # Check for unprocessed documents
-    unprocessed = db.query(Document).filter(
-        Document.clinic_id == clinic_id,
-        Document.status == DocumentStatus.UPLOADED
-    ).count()
-    
     if unprocessed > 10:
         alerts.append({
             "type": "info",
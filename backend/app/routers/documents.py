@@ -1,21 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Response
+from sqlalchemy.orm import Session, joinedload, raiseload
+from sqlalchemy import exists, func, tuple_, update
+from typing import Dict, List, Optional
 from pathlib import Path
+import asyncio
 import os
 
 from ..database import get_db
 from ..models.document import Document, DocumentStatus, DocumentType
+from ..models.extraction import Extraction
 from ..models.patient import Patient
 from ..models.user import User, UserRole
 from ..schemas.document import (
     DocumentCreate, DocumentUpdate, DocumentResponse, 
-    DocumentListResponse, DocumentAssignmentRequest, DocumentUploadResponse
+    DocumentListResponse, DocumentAssignmentRequest, DocumentUploadResponse,
+    DocumentBulkOperationRequest
 )
 from ..models.clinic import Clinic
-from ..utils.deps import get_current_active_user, require_clinic_access
-from ..utils.file_handler import save_upload_file, delete_file, get_file_info
+from ..utils.cache import (
+    get_cached_clinic_stats, set_cached_clinic_stats, invalidate_clinic_stats, invalidate_patient_dashboard
+)
+from ..utils.deps import get_current_active_user, require_clinic_access, get_patient_id
+from ..utils.file_handler import save_upload_file, delete_file, get_file_info, build_file_response
+from ..utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
@@ -30,6 +37,17 @@ async def upload_document(
 ):
     """Upload a new document."""
     
+    if current_user.role not in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
+        raise HTTPException(status_code=400, detail="Cannot determine clinic association")
+    
+    # Staff without a clinic of their own fall back to clinic 1 until proper
+    # clinic-user relationships exist
+    clinic_id = current_user.clinic.id if current_user.clinic else 1
+    
+    # Validate patient assignment before any bytes are written
+    if patient_id and not _patient_in_clinic(db, patient_id, clinic_id):
+        raise HTTPException(status_code=404, detail="Patient not found in your clinic")
+    
     # Save file to storage
     try:
         file_path, unique_filename, file_size = await save_upload_file(file)
@@ -38,31 +56,6 @@ async def upload_document(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
     
-    # Get clinic_id based on user role
-    clinic_id = None
-    if current_user.role == UserRole.CLINIC_ADMIN or current_user.role == UserRole.CLINIC_STAFF:
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-        if not clinic:
-            # For clinic staff, find clinic through relationships
-            # This should be improved with proper clinic-user relationships
-            clinic_id = 1  # Default for now - should be properly implemented
-        else:
-            clinic_id = clinic.id
-    
-    if not clinic_id:
-        raise HTTPException(status_code=400, detail="Cannot determine clinic association")
-    
-    # Validate patient assignment
-    if patient_id:
-        patient = db.query(Patient).filter(
-            Patient.id == patient_id,
-            Patient.clinic_id == clinic_id
-        ).first()
-        if not patient:
-            # Clean up uploaded file
-            delete_file(file_path)
-            raise HTTPException(status_code=404, detail="Patient not found in your clinic")
-    
     # Create document record
     document = Document(
         patient_id=patient_id,
@@ -78,18 +71,23 @@ async def upload_document(
     )
     
     db.add(document)
+    _adjust_clinic_storage(db, clinic_id, file_size)
     db.commit()
     db.refresh(document)
+    await invalidate_clinic_stats(clinic_id)
+    await invalidate_patient_dashboard(patient_id)
     
     return DocumentUploadResponse(
         message="Document uploaded successfully",
-        document=DocumentResponse.from_orm(document)
+        document=DocumentResponse.from_orm_fast(document)
     )
 
 @router.get("/", response_model=DocumentListResponse)
 async def get_documents(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = Query(False),
     patient_id: Optional[int] = None,
     status: Optional[DocumentStatus] = None,
     document_type: Optional[DocumentType] = None,
@@ -103,14 +101,14 @@ async def get_documents(
     
     if current_user.role == UserRole.PATIENT:
         # Patients can only see their own documents
-        patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-        if not patient:
+        own_patient_id = get_patient_id(db, current_user)
+        if own_patient_id is None:
             raise HTTPException(status_code=404, detail="Patient profile not found")
-        query = query.filter(Document.patient_id == patient.id)
+        query = query.filter(Document.patient_id == own_patient_id)
     
     elif current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
         # Clinic users see documents from their clinic
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+        clinic = current_user.clinic
         if clinic:
             query = query.filter(Document.clinic_id == clinic.id)
         else:
@@ -125,19 +123,130 @@ async def get_documents(
     if document_type:
         query = query.filter(Document.document_type == document_type)
     
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination
-    offset = (page - 1) * per_page
-    documents = query.offset(offset).limit(per_page).all()
-    
-    return DocumentListResponse(
-        documents=[DocumentResponse.from_orm(doc) for doc in documents],
+    # Counting every matching row is opt-in; has_next covers paging
+    total = query.with_entities(func.count(Document.id)).scalar() if include_total else None
+    
+    # Keyset pagination: seek past the cursor's (upload_date, id) instead of
+    # skipping rows with OFFSET; `page` without a cursor still works for page 1
+    # and for clients that haven't moved to cursors
+    query = query.order_by(Document.upload_date.desc(), Document.id.desc())
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Document.upload_date, Document.id) < (cursor_date, cursor_id))
+    else:
+        query = query.offset((page - 1) * per_page)
+    
+    # One extra row tells us whether another page exists; raiseload makes any
+    # relationship access while serializing the page fail loudly instead of
+    # quietly issuing a SELECT per row
+    documents = query.options(raiseload("*")).limit(per_page + 1).all()
+    has_next = len(documents) > per_page
+    documents = documents[:per_page]
+    next_cursor = encode_cursor(documents[-1].upload_date, documents[-1].id) if has_next else None
+    
+    response = DocumentListResponse(
+        documents=[DocumentResponse.from_orm_fast(doc) for doc in documents],
         total=total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        has_next=has_next,
+        has_previous=bool(cursor) or page > 1,
+        next_cursor=next_cursor
     )
+    
+    # The page is already a validated model; serialize it in one pass with
+    # pydantic-core instead of letting FastAPI re-validate and re-encode it
+    return Response(response.model_dump_json(), media_type="application/json")
+
+@router.get("/analytics")
+async def get_document_analytics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_clinic_access)
+):
+    """Get document counts by status and type, and storage used, for the clinic."""
+    
+    clinic = current_user.clinic
+    if not clinic:
+        raise HTTPException(status_code=400, detail="Clinic not found")
+    
+    cached = await get_cached_clinic_stats("analytics", clinic.id)
+    if cached is not None:
+        return cached
+    
+    # One grouped pass over the clinic's documents; the (status, type) grid
+    # is folded into the per-status and per-type totals here
+    rows = db.query(
+        Document.status,
+        Document.document_type,
+        func.count(Document.id),
+        func.coalesce(func.sum(Document.file_size), 0)
+    ).filter(Document.clinic_id == clinic.id).group_by(Document.status, Document.document_type).all()
+    
+    total = 0
+    storage_used = 0
+    by_status: Dict[str, int] = {}
+    by_type: Dict[str, int] = {}
+    for doc_status, doc_type, count, size in rows:
+        total += count
+        storage_used += size
+        if doc_status:
+            by_status[doc_status.value] = by_status.get(doc_status.value, 0) + count
+        if doc_type:
+            by_type[doc_type.value] = by_type.get(doc_type.value, 0) + count
+    
+    analytics = {
+        "total": total,
+        "byStatus": by_status,
+        "byType": by_type,
+        "storageUsed": storage_used
+    }
+    await set_cached_clinic_stats("analytics", clinic.id, analytics)
+    return analytics
+
+@router.post("/bulk")
+async def bulk_document_operation(
+    request: DocumentBulkOperationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_clinic_access)
+):
+    """Apply one operation to several of the clinic's documents."""
+    
+    clinic = current_user.clinic
+    if not clinic:
+        raise HTTPException(status_code=400, detail="Clinic not found")
+    
+    in_clinic = (Document.id.in_(request.document_ids), Document.clinic_id == clinic.id)
+    
+    if request.operation == "delete":
+        documents = db.query(Document.file_path, Document.file_size, Document.patient_id).filter(*in_clinic).all()
+        if len(documents) != len(request.document_ids):
+            raise HTTPException(status_code=404, detail="One or more documents not found in your clinic")
+        patient_ids = [doc.patient_id for doc in documents]
+        
+        # One DELETE for the rows, then the files are moved out concurrently
+        # in worker threads rather than one blocking call after another
+        _delete_document_rows(db, request.document_ids)
+        _adjust_clinic_storage(db, clinic.id, -sum(doc.file_size or 0 for doc in documents))
+        db.commit()
+        
+        await asyncio.gather(*(asyncio.to_thread(delete_file, doc.file_path) for doc in documents))
+    
+    else:
+        values = _bulk_update_values(db, request, clinic.id)
+        patient_ids = [patient_id for (patient_id,) in db.query(Document.patient_id).filter(*in_clinic).distinct()]
+        patient_ids.append(values.get(Document.patient_id))
+        
+        # One UPDATE for every row; its row count doubles as the ownership check
+        updated = db.query(Document).filter(*in_clinic).update(values, synchronize_session=False)
+        if updated != len(request.document_ids):
+            db.rollback()
+            raise HTTPException(status_code=404, detail="One or more documents not found in your clinic")
+        db.commit()
+    
+    await invalidate_clinic_stats(clinic.id)
+    await invalidate_patient_dashboard(*patient_ids)
+    
+    return {"message": f"Bulk {request.operation} completed", "processed": len(request.document_ids)}
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
@@ -146,23 +255,8 @@ async def get_document(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get document by ID."""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Check permissions
-    if current_user.role == UserRole.PATIENT:
-        patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-        if not patient or document.patient_id != patient.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    elif current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-        if clinic and document.clinic_id != clinic.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    return DocumentResponse.from_orm(document)
+    document = _get_document_for_user(db, document_id, current_user)
+    return DocumentResponse.from_orm_fast(document)
 
 @router.get("/{document_id}/download")
 async def download_document(
@@ -171,30 +265,21 @@ async def download_document(
     current_user: User = Depends(get_current_active_user)
 ):
     """Download document file."""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Check permissions (same logic as get_document)
-    if current_user.role == UserRole.PATIENT:
-        patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-        if not patient or document.patient_id != patient.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    elif current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-        if clinic and document.clinic_id != clinic.id:
-            raise HTTPException(status_code=403, detail="Access denied")
+    document = _get_document_for_user(db, document_id, current_user)
     
-    # Check if file exists
-    if not os.path.exists(document.file_path):
+    # One stat both checks the file exists and sizes the response; it runs in
+    # a worker thread since networked storage can take a while to answer
+    try:
+        stat_result = await asyncio.to_thread(os.stat, document.file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found on server")
     
-    return FileResponse(
-        path=document.file_path,
+    # Large files go out through nginx's sendfile when X-Accel-Redirect is configured
+    return build_file_response(
+        document.file_path,
         filename=document.original_filename,
-        media_type=document.mime_type
+        media_type=document.mime_type,
+        stat_result=stat_result
     )
 
 @router.put("/{document_id}/assign", response_model=DocumentResponse)
@@ -206,30 +291,21 @@ async def assign_document_to_patient(
 ):
     """Assign document to a patient."""
     
-    # Get document
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Check clinic permission
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-    if clinic and document.clinic_id != clinic.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    # Get document and check clinic permission
+    document = _get_document_for_user(db, document_id, current_user)
     
     # Validate patient
-    patient = db.query(Patient).filter(
-        Patient.id == assignment.patient_id,
-        Patient.clinic_id == document.clinic_id
-    ).first()
-    if not patient:
+    if not _patient_in_clinic(db, assignment.patient_id, document.clinic_id):
         raise HTTPException(status_code=404, detail="Patient not found in clinic")
     
     # Update assignment
+    previous_patient_id = document.patient_id
     document.patient_id = assignment.patient_id
     db.commit()
     db.refresh(document)
+    await invalidate_patient_dashboard(previous_patient_id, document.patient_id)
     
-    return DocumentResponse.from_orm(document)
+    return DocumentResponse.from_orm_fast(document)
 
 @router.put("/{document_id}", response_model=DocumentResponse)
 async def update_document(
@@ -240,14 +316,7 @@ async def update_document(
 ):
     """Update document metadata."""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Check permissions
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-    if clinic and document.clinic_id != clinic.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    document = _get_document_for_user(db, document_id, current_user)
     
     # Update fields
     update_data = document_update.dict(exclude_unset=True)
@@ -256,8 +325,10 @@ async def update_document(
     
     db.commit()
     db.refresh(document)
+    await invalidate_clinic_stats(document.clinic_id)  # Type may have changed
+    await invalidate_patient_dashboard(document.patient_id)
     
-    return DocumentResponse.from_orm(document)
+    return DocumentResponse.from_orm_fast(document)
 
 @router.delete("/{document_id}")
 async def delete_document(
@@ -267,20 +338,84 @@ async def delete_document(
 ):
     """Delete document."""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Check permissions
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
-    if clinic and document.clinic_id != clinic.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    document = _get_document_for_user(db, document_id, current_user)
     
     # Delete file from storage
     delete_file(document.file_path)
     
     # Delete database record
+    clinic_id, patient_id = document.clinic_id, document.patient_id
     db.delete(document)
+    _adjust_clinic_storage(db, clinic_id, -(document.file_size or 0))
     db.commit()
+    await invalidate_clinic_stats(clinic_id)
+    await invalidate_patient_dashboard(patient_id)
+    
+    return {"message": "Document deleted successfully"}
+
+def _delete_document_rows(db: Session, document_ids: List[int]) -> None:
+    """Delete documents in one statement, detaching their extractions first."""
+    # A bulk DELETE skips the ORM, which nulls extractions.document_id when a
+    # single document is deleted; do the same here so the FK doesn't block it
+    db.execute(
+        update(Extraction)
+        .where(Extraction.document_id.in_(document_ids))
+        .values(document_id=None)
+    )
+    db.query(Document).filter(Document.id.in_(document_ids)).delete(synchronize_session=False)
+
+def _bulk_update_values(db: Session, request: DocumentBulkOperationRequest, clinic_id: int) -> Dict:
+    """Validate bulk assign/update parameters into column values."""
+    params = request.parameters
+    
+    if request.operation == "assign":
+        patient_id = params.get("patient_id")
+        if not patient_id or not _patient_in_clinic(db, patient_id, clinic_id):
+            raise HTTPException(status_code=404, detail="Patient not found in clinic")
+        return {Document.patient_id: patient_id}
+    
+    values = {}
+    try:
+        if params.get("document_type"):
+            values[Document.document_type] = DocumentType(params["document_type"])
+        if params.get("status"):
+            values[Document.status] = DocumentStatus(params["status"])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid document type or status")
+    
+    if not values:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    return values
+
+def _patient_in_clinic(db: Session, patient_id: int, clinic_id: int) -> bool:
+    """Check a patient belongs to the clinic without loading the row."""
+    return db.query(
+        exists().where(Patient.id == patient_id, Patient.clinic_id == clinic_id)
+    ).scalar()
+
+def _adjust_clinic_storage(db: Session, clinic_id: int, delta: int) -> None:
+    """Add `delta` bytes to the clinic's storage counter in the current transaction."""
+    db.execute(
+        update(Clinic)
+        .where(Clinic.id == clinic_id)
+        .values(storage_used_bytes=Clinic.storage_used_bytes + delta)
+    )
+
+def _get_document_for_user(db: Session, document_id: int, current_user: User) -> Document:
+    """Load a document and check the current user may access it, in one query."""
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # A patient's own id comes from their token and a clinic user's clinic was
+    # loaded together with the user, so the check needs no further queries
+    if current_user.role == UserRole.PATIENT:
+        patient_id = get_patient_id(db, current_user)
+        if patient_id is None or document.patient_id != patient_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+    elif current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
+        clinic = current_user.clinic
+        if clinic and document.clinic_id != clinic.id:
+            raise HTTPException(status_code=403, detail="Access denied")
     
-    return {"message": "Document deleted successfully"}
\ No newline at end of file
+    return document
@@ -1,21 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func
-from typing import List, Optional
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import bindparam, case, desc, func, literal, or_, select, union_all
+from typing import List, Optional, Union
+from datetime import datetime, timedelta, timezone
+import hashlib
+import orjson
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.patient import Patient
 from ..models.document import Document, DocumentStatus, DocumentType
 from ..models.extraction import Extraction
-from ..models.user import User, UserRole
 from ..schemas.patient import PatientDetailResponse
 from ..schemas.document import DocumentResponse
-from ..utils.deps import get_current_active_user
+from ..utils.cache import get_cached_patient_dashboard, set_cached_patient_dashboard
+from ..utils.deps import PatientContext, get_patient_context
 from ..utils.audit import get_audit_logger, AuditAction, AuditEntityType
 
 router = APIRouter(prefix="/patient-dashboard", tags=["patient-dashboard"])
 
+# Most events the timeline endpoint returns
+TIMELINE_MAX_EVENTS = 200
+
+# Dashboard payloads are per patient and may be reused only after revalidating
+DASHBOARD_CACHE_CONTROL = "private, no-cache"
+
+# The hot queries below have a fixed shape, so they're built once here and
+# take their values as bound parameters instead of being rebuilt per request
+_of_patient = Document.patient_id == bindparam("patient_id")
+
+_DASHBOARD_PATIENT = select(Patient).options(
+    joinedload(Patient.user),
+    joinedload(Patient.clinic)
+).where(Patient.id == bindparam("patient_id"))
+
+_DASHBOARD_STATS = select(
+    func.count(Document.id).label("total"),
+    func.count(case((Document.upload_date >= bindparam("week_ago"), 1))).label("recent"),
+    func.count(case((Document.status == DocumentStatus.PROCESSED, 1))).label("processed"),
+    func.count(case((
+        Document.status.in_([DocumentStatus.UPLOADED, DocumentStatus.PROCESSING]), 1
+    ))).label("pending"),
+    func.coalesce(func.sum(Document.file_size), 0).label("storage_used"),
+    func.max(Document.upload_date).label("last_upload")
+).where(_of_patient)
+
+_DOCUMENT_TYPE_COUNTS = select(
+    Document.document_type,
+    func.count(Document.id)
+).where(_of_patient).group_by(Document.document_type)
+
+_DASHBOARD_DOCUMENTS = select(Document).options(
+    selectinload(Document.extractions)
+).where(
+    _of_patient,
+    or_(
+        Document.upload_date >= bindparam("since"),
+        Document.id.in_(select(Document.id).where(_of_patient).order_by(desc(Document.upload_date)).limit(10))
+    )
+).order_by(desc(Document.upload_date))
+
+_month_label = func.to_char(func.timezone("UTC", Document.upload_date), "YYYY-MM")
+_MONTHLY_COUNTS = select(
+    _month_label,
+    func.count(Document.id)
+).where(_of_patient, Document.upload_date >= bindparam("since")).group_by(_month_label)
+
+_STATUS_COUNTS = select(
+    func.count(Document.id),
+    func.count(case((Document.status == DocumentStatus.PROCESSED, 1))),
+    func.count(case((Document.status == DocumentStatus.FAILED, 1)))
+).where(_of_patient)
+
+_timeline_window = (_of_patient, Document.upload_date >= bindparam("since"))
+_timeline_fields = (Document.id, Document.original_filename, Document.document_type, Document.status)
+_timeline_events = union_all(
+    select(
+        Document.upload_date.label("date"), literal("document_upload").label("type"), *_timeline_fields
+    ).where(*_timeline_window),
+    select(
+        Document.processed_date.label("date"), literal("document_processed").label("type"), *_timeline_fields
+    ).where(*_timeline_window, Document.processed_date.isnot(None))
+).subquery()
+_TIMELINE_EVENTS = select(_timeline_events).order_by(desc(_timeline_events.c.date)).limit(TIMELINE_MAX_EVENTS)
+
 class PatientDashboardStats(BaseModel):
     total_documents: int
     recent_documents: int
@@ -34,89 +102,79 @@ class PatientDashboardResponse(BaseModel):
 @router.get("/", response_model=PatientDashboardResponse)
 async def get_patient_dashboard(
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    context: PatientContext = Depends(get_patient_context)
 ):
     """Get patient dashboard data."""
     
-    # Ensure user is a patient or find their patient record
-    patient = None
-    if current_user.role == UserRole.PATIENT:
-        patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-        if not patient:
-            raise HTTPException(status_code=404, detail="Patient profile not found")
-    else:
-        raise HTTPException(status_code=403, detail="Access denied - patients only")
-    
     # Log dashboard access
-    audit_logger = get_audit_logger(db)
+    audit_logger = get_audit_logger()
     audit_logger.log_patient_action(
         action=AuditAction.VIEW,
-        user=current_user,
-        patient_id=patient.id,
-        patient_name=patient.patient_id,
+        user=context.user,
+        patient_id=context.patient_id,
+        patient_name=context.hospital_patient_id,
         description="Accessed patient dashboard",
         request=request
     )
     
-    # Get patient documents
-    documents_query = db.query(Document).filter(Document.patient_id == patient.id)
-    total_documents = documents_query.count()
+    # Access is audited above on every request; the payload itself comes from
+    # the cache while it's fresh
+    cached = await get_cached_patient_dashboard("dashboard", context.patient_id)
+    if cached:
+        return _dashboard_response(request, cached)
     
-    # Calculate stats
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_documents = documents_query.filter(Document.upload_date >= week_ago).count()
-    processed_documents = documents_query.filter(Document.status == DocumentStatus.PROCESSED).count()
-    pending_documents = documents_query.filter(
-        Document.status.in_([DocumentStatus.UPLOADED, DocumentStatus.PROCESSING])
-    ).count()
-    
-    # Storage used
-    storage_used = db.query(func.sum(Document.file_size)).filter(
-        Document.patient_id == patient.id
-    ).scalar() or 0
+    # The profile below reads the patient's user and clinic, which an async
+    # session can't lazy-load
+    patient = await db.scalar(_DASHBOARD_PATIENT, {"patient_id": context.patient_id})
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient profile not found")
     
-    # Last upload
-    last_document = documents_query.order_by(desc(Document.upload_date)).first()
-    last_upload = last_document.upload_date if last_document else None
+    # Calculate stats in one pass over the patient's documents
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    stats_result = await db.execute(_DASHBOARD_STATS, {"patient_id": patient.id, "week_ago": week_ago})
+    stats_row = stats_result.one()
     
     # Document types distribution
-    doc_type_stats = db.query(
-        Document.document_type,
-        func.count(Document.id)
-    ).filter(
-        Document.patient_id == patient.id
-    ).group_by(Document.document_type).all()
+    doc_type_stats = await db.execute(_DOCUMENT_TYPE_COUNTS, {"patient_id": patient.id})
     
     document_types = {doc_type.value: count for doc_type, count in doc_type_stats}
     
+    # The last 10 documents and the timeline's 30-day window come back in one
+    # query; either set may be larger depending on how often the patient uploads
+    since_date = datetime.now(timezone.utc) - timedelta(days=30)
+    documents = await db.scalars(_DASHBOARD_DOCUMENTS, {"patient_id": patient.id, "since": since_date})
+    documents = documents.all()
+    
     # Recent documents (last 10)
-    recent_docs = documents_query.options(
-        joinedload(Document.extractions)
-    ).order_by(desc(Document.upload_date)).limit(10).all()
+    recent_docs = documents[:10]
     
     # Timeline events
-    timeline_events = _build_patient_timeline(patient.id, db)
+    timeline_events = _timeline_from_docs([doc for doc in documents if doc.upload_date >= since_date])
     
     # Build patient profile
-    patient_profile = _build_patient_detail(patient, db)
+    patient_profile = _build_patient_detail(patient, stats_row.total)
     
     stats = PatientDashboardStats(
-        total_documents=total_documents,
-        recent_documents=recent_documents,
-        processed_documents=processed_documents,
-        pending_documents=pending_documents,
-        storage_used=storage_used,
-        last_upload=last_upload,
+        total_documents=stats_row.total,
+        recent_documents=stats_row.recent,
+        processed_documents=stats_row.processed,
+        pending_documents=stats_row.pending,
+        storage_used=stats_row.storage_used,
+        last_upload=stats_row.last_upload,
         document_types=document_types
     )
     
-    return PatientDashboardResponse(
+    response = PatientDashboardResponse(
         patient_profile=patient_profile,
         stats=stats,
-        recent_documents=[DocumentResponse.from_orm(doc) for doc in recent_docs],
+        recent_documents=[DocumentResponse.from_orm_fast(doc) for doc in recent_docs],
         timeline_events=timeline_events
     )
+    
+    payload = response.model_dump_json()
+    await set_cached_patient_dashboard("dashboard", patient.id, payload)
+    return _dashboard_response(request, payload)
 
 @router.get("/documents", response_model=List[DocumentResponse])
 async def get_patient_documents(
@@ -125,174 +183,196 @@ async def get_patient_documents(
     status: Optional[DocumentStatus] = None,
     document_type: Optional[DocumentType] = None,
     request: Request = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    context: PatientContext = Depends(get_patient_context)
 ):
     """Get patient's documents with filtering."""
     
-    # Get patient
-    patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient profile not found")
-    
     # Log document access
-    audit_logger = get_audit_logger(db)
+    audit_logger = get_audit_logger()
     audit_logger.log_patient_action(
         action=AuditAction.VIEW,
-        user=current_user,
-        patient_id=patient.id,
-        patient_name=patient.patient_id,
+        user=context.user,
+        patient_id=context.patient_id,
+        patient_name=context.hospital_patient_id,
         description="Viewed patient documents list",
         request=request,
         metadata={"page": page, "per_page": per_page, "status": status, "type": document_type}
     )
     
     # Build query
-    query = db.query(Document).filter(Document.patient_id == patient.id)
+    query = select(Document).where(Document.patient_id == context.patient_id)
     
     if status:
-        query = query.filter(Document.status == status)
+        query = query.where(Document.status == status)
     if document_type:
-        query = query.filter(Document.document_type == document_type)
+        query = query.where(Document.document_type == document_type)
     
     # Apply pagination
     offset = (page - 1) * per_page
-    documents = query.order_by(desc(Document.upload_date)).offset(offset).limit(per_page).all()
+    documents = await db.scalars(query.order_by(desc(Document.upload_date)).offset(offset).limit(per_page))
     
-    return [DocumentResponse.from_orm(doc) for doc in documents]
+    # orjson encodes the dumped fields' datetimes and enums itself, so the
+    # list skips FastAPI's response validation and jsonable_encoder
+    payload = orjson.dumps([DocumentResponse.from_orm_fast(doc).model_dump() for doc in documents])
+    return Response(payload, media_type="application/json")
 
 @router.get("/timeline")
 async def get_patient_timeline(
     days: int = Query(30, ge=7, le=365),
     request: Request = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    context: PatientContext = Depends(get_patient_context)
 ):
     """Get patient's medical timeline."""
     
-    # Get patient
-    patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient profile not found")
-    
     # Log timeline access
-    audit_logger = get_audit_logger(db)
+    audit_logger = get_audit_logger()
     audit_logger.log_patient_action(
         action=AuditAction.VIEW,
-        user=current_user,
-        patient_id=patient.id,
-        patient_name=patient.patient_id,
+        user=context.user,
+        patient_id=context.patient_id,
+        patient_name=context.hospital_patient_id,
         description="Viewed patient timeline",
         request=request,
         metadata={"days": days}
     )
     
-    timeline_events = _build_patient_timeline(patient.id, db, days)
+    timeline_events = await _build_patient_timeline(context.patient_id, db, days)
     
-    return {"timeline_events": timeline_events}
+    return Response(orjson.dumps({"timeline_events": timeline_events}), media_type="application/json")
 
 @router.get("/stats")
 async def get_patient_stats(
     request: Request = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    context: PatientContext = Depends(get_patient_context)
 ):
     """Get detailed patient statistics."""
     
-    # Get patient
-    patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient profile not found")
+    # Only changes on uploads and status changes, which drop the cached copy
+    cached = await get_cached_patient_dashboard("stats", context.patient_id)
+    if cached:
+        return Response(cached, media_type="application/json")
     
-    # Build comprehensive stats
-    documents_query = db.query(Document).filter(Document.patient_id == patient.id)
+    # Last 12 calendar months, newest first
+    now = datetime.now(timezone.utc)
+    months = [now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)]
+    for _ in range(11):
+        months.append((months[-1] - timedelta(days=1)).replace(day=1))
     
-    # Monthly document counts (last 12 months)
-    monthly_stats = []
-    for i in range(12):
-        month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_start = month_start - timedelta(days=30 * i)
-        month_end = month_start + timedelta(days=30)
-        
-        count = documents_query.filter(
-            Document.upload_date >= month_start,
-            Document.upload_date < month_end
-        ).count()
-        
-        monthly_stats.append({
-            "month": month_start.strftime("%Y-%m"),
-            "count": count
-        })
+    # Monthly document counts, bucketed by the database in one query
+    monthly_rows = await db.execute(_MONTHLY_COUNTS, {"patient_id": context.patient_id, "since": months[-1]})
+    monthly_counts = dict(monthly_rows.all())
+    
+    monthly_stats = [
+        {"month": month.strftime("%Y-%m"), "count": monthly_counts.get(month.strftime("%Y-%m"), 0)}
+        for month in months
+    ]
     
     # Document processing success rate
-    total_docs = documents_query.count()
-    processed_docs = documents_query.filter(Document.status == DocumentStatus.PROCESSED).count()
-    failed_docs = documents_query.filter(Document.status == DocumentStatus.FAILED).count()
+    status_counts = await db.execute(_STATUS_COUNTS, {"patient_id": context.patient_id})
+    total_docs, processed_docs, failed_docs = status_counts.one()
     
     success_rate = (processed_docs / total_docs * 100) if total_docs > 0 else 0
     
-    return {
+    payload = orjson.dumps({
         "monthly_documents": monthly_stats,
         "processing_success_rate": round(success_rate, 1),
         "total_documents": total_docs,
         "processed_documents": processed_docs,
         "failed_documents": failed_docs
-    }
+    })
+    
+    # The month buckets shift when the next UTC month starts, so the cached
+    # copy must expire by then
+    next_month = (months[0] + timedelta(days=32)).replace(day=1)
+    seconds_left = int((next_month - now).total_seconds()) + 1
+    await set_cached_patient_dashboard("stats", context.patient_id, payload, ttl=seconds_left)
+    return Response(payload, media_type="application/json")
 
-def _build_patient_timeline(patient_id: int, db: Session, days: int = 30) -> List[dict]:
-    """Build patient timeline events."""
+def _dashboard_response(request: Request, payload: Union[str, bytes]) -> Response:
+    """Send dashboard JSON with an ETag of its bytes, or 304 if the client has it."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    
+    # Polling clients revalidate every time and only download changed payloads
+    headers = {
+        "ETag": f'W/"{hashlib.blake2b(payload, digest_size=8).hexdigest()}"',
+        "Cache-Control": DASHBOARD_CACHE_CONTROL,
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
     
-    since_date = datetime.now() - timedelta(days=days)
+    return Response(payload, media_type="application/json", headers=headers)
+
+async def _build_patient_timeline(patient_id: int, db: AsyncSession, days: int = 30) -> List[dict]:
+    """Build patient timeline events, newest first."""
     
-    timeline = []
+    since_date = datetime.now(timezone.utc) - timedelta(days=days)
     
-    # Document uploads
-    documents = db.query(Document).filter(
-        Document.patient_id == patient_id,
-        Document.upload_date >= since_date
-    ).order_by(desc(Document.upload_date)).all()
+    # Upload and processing events are merged, sorted and capped by the database
+    rows = await db.execute(_TIMELINE_EVENTS, {"patient_id": patient_id, "since": since_date})
+    return [_timeline_event(*row) for row in rows]
+
+def _timeline_from_docs(documents: List[Document]) -> List[dict]:
+    """Build timeline events from already loaded documents."""
     
+    events = []
     for doc in documents:
-        timeline.append({
-            "date": doc.upload_date,
+        fields = (doc.id, doc.original_filename, doc.document_type, doc.status)
+        events.append((doc.upload_date, "document_upload", *fields))
+        
+        # Add processing completion events
+        if doc.processed_date:
+            events.append((doc.processed_date, "document_processed", *fields))
+    
+    # Sort timeline by date (newest first), capped like the timeline endpoint
+    events.sort(key=lambda event: event[0], reverse=True)
+    
+    return [_timeline_event(*event) for event in events[:TIMELINE_MAX_EVENTS]]
+
+def _timeline_event(
+    date: datetime,
+    event_type: str,
+    document_id: int,
+    filename: str,
+    document_type: DocumentType,
+    document_status: DocumentStatus
+) -> dict:
+    """Build one timeline event for a document."""
+    if event_type == "document_upload":
+        return {
+            "date": date,
             "type": "document_upload",
-            "title": f"Document Uploaded: {doc.original_filename}",
-            "description": f"{doc.document_type.value.replace('_', ' ').title()} uploaded",
+            "title": f"Document Uploaded: {filename}",
+            "description": f"{document_type.value.replace('_', ' ').title()} uploaded",
             "icon": "document",
             "color": "blue",
             "metadata": {
-                "document_id": doc.id,
-                "filename": doc.original_filename,
-                "type": doc.document_type.value,
-                "status": doc.status.value
+                "document_id": document_id,
+                "filename": filename,
+                "type": document_type.value,
+                "status": document_status.value
             }
-        })
-        
-        # Add processing completion events
-        if doc.processed_date:
-            timeline.append({
-                "date": doc.processed_date,
-                "type": "document_processed",
-                "title": f"Document Processed: {doc.original_filename}",
-                "description": "AI analysis completed",
-                "icon": "check-circle",
-                "color": "green",
-                "metadata": {
-                    "document_id": doc.id,
-                    "filename": doc.original_filename
-                }
-            })
-    
-    # Sort timeline by date (newest first)
-    timeline.sort(key=lambda x: x["date"], reverse=True)
-    
-    return timeline
-
-def _build_patient_detail(patient: Patient, db: Session):
-    """Build detailed patient response."""
+        }
     
-    # Get documents count
-    documents_count = db.query(Document).filter(Document.patient_id == patient.id).count()
+    return {
+        "date": date,
+        "type": "document_processed",
+        "title": f"Document Processed: {filename}",
+        "description": "AI analysis completed",
+        "icon": "check-circle",
+        "color": "green",
+        "metadata": {
+            "document_id": document_id,
+            "filename": filename
+        }
+    }
+
+def _build_patient_detail(patient: Patient, documents_count: int):
+    """Build detailed patient response; patient.user and patient.clinic must be loaded."""
     
     response_data = {
         "id": patient.id,
@@ -1,22 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, raiseload
+from sqlalchemy import case, exists, func, tuple_, and_, or_
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, date
 
 from ..database import get_db
 from ..models.patient import Patient, Gender
 from ..models.user import User, UserRole
-from ..models.clinic import Clinic
 from ..models.document import Document
 from ..schemas.patient import (
     PatientCreate, PatientUpdate, PatientResponse, PatientDetailResponse,
     PatientListResponse, PatientSearchRequest, PatientStatsResponse
 )
+from ..utils.cache import invalidate_clinic_stats, invalidate_patient_dashboard
 from ..utils.deps import get_current_active_user, require_clinic_access
+from ..utils.demographics import age_bucket_columns
+from ..utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+# Age buckets as (label, oldest age in the bucket); the last bucket is open-ended
+PATIENT_AGE_BUCKETS = [("0-18", 18), ("19-30", 30), ("31-50", 50), ("51-70", 70), ("70+", None)]
+
 @router.post("/", response_model=PatientDetailResponse)
 async def create_patient(
     patient_data: PatientCreate,
@@ -26,25 +31,25 @@ async def create_patient(
     """Create a new patient with enhanced validation."""
     
     # Get clinic
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+    clinic = current_user.clinic
     if not clinic:
         raise HTTPException(status_code=400, detail="Clinic not found")
     
     # Check if patient_id already exists in clinic
-    existing = db.query(Patient).filter(
+    existing = db.query(exists().where(
         Patient.patient_id == patient_data.patient_id,
         Patient.clinic_id == clinic.id
-    ).first()
+    )).scalar()
     if existing:
         raise HTTPException(status_code=400, detail="Patient ID already exists in this clinic")
     
     # Validate user association if provided
     if patient_data.user_id:
-        user = db.query(User).filter(
+        user_exists = db.query(exists().where(
             User.id == patient_data.user_id,
             User.role == UserRole.PATIENT
-        ).first()
-        if not user:
+        )).scalar()
+        if not user_exists:
             raise HTTPException(status_code=404, detail="Patient user not found")
     
     patient = Patient(
@@ -55,14 +60,19 @@ async def create_patient(
     db.add(patient)
     db.commit()
     db.refresh(patient)
+    await invalidate_clinic_stats(clinic.id)
     
-    # Return detailed response
-    return _get_patient_detail(patient.id, db, current_user)
+    # Build the response from the refreshed row instead of re-querying it;
+    # user and clinic are many-to-one lookups the session usually already
+    # holds, and a new patient has no documents yet
+    return _build_patient_detail(patient, db, {})
 
 @router.get("/", response_model=PatientListResponse)
 async def get_patients(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = Query(False),
     search: Optional[str] = None,
     gender: Optional[Gender] = None,
     age_min: Optional[int] = None,
@@ -74,14 +84,11 @@ async def get_patients(
     """Get patients with enhanced filtering and search."""
     
     # Build base query
-    query = db.query(Patient).options(
-        joinedload(Patient.user),
-        joinedload(Patient.clinic)
-    )
+    query = db.query(Patient)
     
     # Apply role-based filtering
     if current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+        clinic = current_user.clinic
         if clinic:
             query = query.filter(Patient.clinic_id == clinic.id)
     elif current_user.role == UserRole.PATIENT:
@@ -117,24 +124,46 @@ async def get_patients(
         else:
             query = query.filter(~Patient.documents.any())
     
-    # Get total count
-    total = query.count()
+    # Counting every matching row is opt-in; has_next covers paging
+    total = query.with_entities(func.count(Patient.id)).scalar() if include_total else None
     
-    # Apply pagination
-    offset = (page - 1) * per_page
-    patients = query.offset(offset).limit(per_page).all()
+    # Keyset pagination on (created_at, id), newest first: a cursor seeks
+    # straight to the next page instead of skipping rows with OFFSET, while
+    # `page` without a cursor keeps working for existing clients
+    query = query.order_by(Patient.created_at.desc(), Patient.id.desc())
+    if cursor:
+        cursor_created, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Patient.created_at, Patient.id) < (cursor_created, cursor_id))
+    else:
+        query = query.offset((page - 1) * per_page)
+    
+    # One extra row tells us whether another page exists; raiseload makes any
+    # relationship beyond user and clinic fail loudly while building the
+    # details instead of quietly issuing a SELECT per patient
+    patients = query.options(
+        joinedload(Patient.user),
+        joinedload(Patient.clinic),
+        raiseload("*")
+    ).limit(per_page + 1).all()
+    has_next = len(patients) > per_page
+    patients = patients[:per_page]
+    next_cursor = encode_cursor(patients[-1].created_at, patients[-1].id) if has_next else None
     
     # Build detailed responses
+    document_stats = _get_document_stats(db, [p.id for p in patients])
     patient_details = []
     for patient in patients:
-        detail = _build_patient_detail(patient, db)
+        detail = _build_patient_detail(patient, db, document_stats)
         patient_details.append(detail)
     
     return PatientListResponse(
         patients=patient_details,
         total=total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        has_next=has_next,
+        has_previous=bool(cursor) or page > 1,
+        next_cursor=next_cursor
     )
 
 @router.get("/stats", response_model=PatientStatsResponse)
@@ -145,72 +174,49 @@ async def get_patient_stats(
     """Get patient statistics for clinic dashboard."""
     
     # Get clinic
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+    clinic = current_user.clinic
     if not clinic:
         raise HTTPException(status_code=400, detail="Clinic not found")
     
-    # Base query for clinic patients
-    base_query = db.query(Patient).filter(Patient.clinic_id == clinic.id)
-    
-    # Total patients
-    total_patients = base_query.count()
-    
-    # New patients this month
+    # Totals, this month's new patients, gender counts and patients with
+    # documents in one pass over the clinic's patients
     month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    new_patients_this_month = base_query.filter(
-        Patient.created_at >= month_start
-    ).count()
-    
-    # Patients by gender
-    gender_stats = db.query(Patient.gender, func.count(Patient.id)).filter(
-        Patient.clinic_id == clinic.id
-    ).group_by(Patient.gender).all()
-    
+    gender_columns = [
+        func.count(case((Patient.gender == gender, 1))).label(gender.value)
+        for gender in Gender
+    ]
+    totals = db.query(
+        func.count(Patient.id).label("total_patients"),
+        func.count(case((Patient.created_at >= month_start, 1))).label("new_patients_this_month"),
+        func.count(case((Patient.documents.any(), 1))).label("patients_with_documents"),
+        *gender_columns,
+        func.count(case((Patient.gender.is_(None), 1))).label("not_specified"),
+        *age_bucket_columns(PATIENT_AGE_BUCKETS)
+    ).filter(Patient.clinic_id == clinic.id).one()._mapping
+    
+    gender_labels = [gender.value for gender in Gender] + ["not_specified"]
     patients_by_gender = {
-        str(gender.value) if gender else 'not_specified': count 
-        for gender, count in gender_stats
-    }
-    
-    # Patients by age group
-    today = date.today()
-    age_groups = {
-        '0-18': 0, '19-30': 0, '31-50': 0, '51-70': 0, '70+': 0
+        label: totals[label] for label in gender_labels if totals[label]
     }
     
-    patients_with_dob = base_query.filter(Patient.date_of_birth.isnot(None)).all()
-    for patient in patients_with_dob:
-        age = today.year - patient.date_of_birth.year
-        if patient.date_of_birth.month > today.month or \
-           (patient.date_of_birth.month == today.month and patient.date_of_birth.day > today.day):
-            age -= 1
-        
-        if age <= 18:
-            age_groups['0-18'] += 1
-        elif age <= 30:
-            age_groups['19-30'] += 1
-        elif age <= 50:
-            age_groups['31-50'] += 1
-        elif age <= 70:
-            age_groups['51-70'] += 1
-        else:
-            age_groups['70+'] += 1
-    
-    # Patients with documents
-    patients_with_documents = base_query.filter(Patient.documents.any()).count()
+    # Patients by age group, counted in the same pass from birth-date cutoffs
+    age_groups = {label: totals[label] for label, _ in PATIENT_AGE_BUCKETS}
     
     # Recent patients
-    recent_patients = base_query.options(
-        joinedload(Patient.user)
+    recent_patients = db.query(Patient).filter(Patient.clinic_id == clinic.id).options(
+        joinedload(Patient.user),
+        joinedload(Patient.clinic)
     ).order_by(Patient.created_at.desc()).limit(5).all()
     
-    recent_patient_details = [_build_patient_detail(p, db) for p in recent_patients]
+    document_stats = _get_document_stats(db, [p.id for p in recent_patients])
+    recent_patient_details = [_build_patient_detail(p, db, document_stats) for p in recent_patients]
     
     return PatientStatsResponse(
-        total_patients=total_patients,
-        new_patients_this_month=new_patients_this_month,
+        total_patients=totals["total_patients"],
+        new_patients_this_month=totals["new_patients_this_month"],
         patients_by_gender=patients_by_gender,
         patients_by_age_group=age_groups,
-        patients_with_documents=patients_with_documents,
+        patients_with_documents=totals["patients_with_documents"],
         recent_patients=recent_patient_details
     )
 
@@ -241,7 +247,7 @@ async def update_patient(
         if patient.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
     elif current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+        clinic = current_user.clinic
         if clinic and patient.clinic_id != clinic.id:
             raise HTTPException(status_code=403, detail="Access denied")
     
@@ -252,8 +258,12 @@ async def update_patient(
     
     db.commit()
     db.refresh(patient)
+    await invalidate_patient_dashboard(patient.id)
+    await invalidate_clinic_stats(patient.clinic_id)
     
-    return _get_patient_detail(patient.id, db, current_user)
+    # Permissions were checked above, so build the response from the
+    # refreshed row instead of re-querying it through _get_patient_detail
+    return _build_patient_detail(patient, db)
 
 @router.delete("/{patient_id}")
 async def delete_patient(
@@ -268,20 +278,22 @@ async def delete_patient(
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Check clinic permissions
-    clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+    clinic = current_user.clinic
     if clinic and patient.clinic_id != clinic.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Check if patient has documents
-    document_count = db.query(Document).filter(Document.patient_id == patient.id).count()
+    document_count = db.query(func.count(Document.id)).filter(Document.patient_id == patient.id).scalar()
     if document_count > 0:
         raise HTTPException(
             status_code=400, 
             detail=f"Cannot delete patient with {document_count} documents. Delete or reassign documents first."
         )
     
+    clinic_id = patient.clinic_id
     db.delete(patient)
     db.commit()
+    await invalidate_clinic_stats(clinic_id)
     
     return {"message": "Patient deleted successfully"}
 
@@ -290,7 +302,8 @@ def _get_patient_detail(patient_id: int, db: Session, current_user: User) -> Pat
     
     query = db.query(Patient).options(
         joinedload(Patient.user),
-        joinedload(Patient.clinic)
+        joinedload(Patient.clinic),
+        raiseload("*")
     )
     
     if current_user.role == UserRole.PATIENT:
@@ -306,22 +319,42 @@ def _get_patient_detail(patient_id: int, db: Session, current_user: User) -> Pat
     
     # Check clinic permissions for clinic users
     if current_user.role in [UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF]:
-        clinic = db.query(Clinic).filter(Clinic.admin_user_id == current_user.id).first()
+        clinic = current_user.clinic
         if clinic and patient.clinic_id != clinic.id:
             raise HTTPException(status_code=403, detail="Access denied")
     
     return _build_patient_detail(patient, db)
 
-def _build_patient_detail(patient: Patient, db: Session) -> PatientDetailResponse:
+def _get_document_stats(
+    db: Session, patient_ids: List[int]
+) -> Dict[int, Tuple[int, Optional[datetime]]]:
+    """Get document count and last upload date for a batch of patients in one query."""
+    
+    if not patient_ids:
+        return {}
+    
+    rows = db.query(
+        Document.patient_id,
+        func.count(Document.id),
+        func.max(Document.upload_date)
+    ).filter(
+        Document.patient_id.in_(patient_ids)
+    ).group_by(Document.patient_id).all()
+    
+    return {patient_id: (count, last_upload) for patient_id, count, last_upload in rows}
+
+def _build_patient_detail(
+    patient: Patient,
+    db: Session,
+    document_stats: Optional[Dict[int, Tuple[int, Optional[datetime]]]] = None
+) -> PatientDetailResponse:
     """Build detailed patient response."""
     
-    # Get documents count
-    documents_count = db.query(Document).filter(Document.patient_id == patient.id).count()
-    
-    # Get last document upload date as proxy for last visit
-    last_document = db.query(Document).filter(
-        Document.patient_id == patient.id
-    ).order_by(Document.upload_date.desc()).first()
+    # Document count and last upload date (proxy for last visit), prefetched
+    # by list endpoints so each row doesn't issue its own queries
+    if document_stats is None:
+        document_stats = _get_document_stats(db, [patient.id])
+    documents_count, last_visit = document_stats.get(patient.id, (0, None))
     
     response_data = PatientResponse.from_orm(patient).dict()
     
@@ -332,7 +365,7 @@ def _build_patient_detail(patient: Patient, db: Session) -> PatientDetailRespons
         "user_email": patient.user.email if patient.user else None,
         "clinic_name": patient.clinic.name if patient.clinic else None,
         "documents_count": documents_count,
-        "last_visit": last_document.upload_date if last_document else None
+        "last_visit": last_visit
     })
     
     return PatientDetailResponse(**response_data)
\ No newline at end of file
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+import asyncio
+import os
+import stat
+
+from ..utils.file_handler import UPLOAD_DIR, build_file_response
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+# Uploads are private; clients revalidate with the ETag before reuse
+UPLOADS_CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+def _is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Check the request's conditional headers against the file's validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    
+    return False
+
+def _locate_upload(file_path: str) -> Optional[Tuple[Path, os.stat_result]]:
+    """Resolve a path inside the uploads directory and stat it; None if it's not a stored file."""
+    # Resolve the path and make sure it stays inside the uploads directory
+    base_dir = UPLOAD_DIR.resolve()
+    full_path = (base_dir / file_path).resolve()
+    if base_dir not in full_path.parents:
+        return None
+    
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        return None
+    
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    return full_path, stat_result
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"])
+async def get_upload(file_path: str, request: Request):
+    """Serve a stored upload."""
+    
+    # Path resolution and stat touch the filesystem, which can be slow on
+    # networked storage, so they run in a worker thread
+    located = await asyncio.to_thread(_locate_upload, file_path)
+    if located is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    full_path, stat_result = located
+    
+    # Validators from mtime and size, so no file read is needed
+    cache_headers = {
+        "ETag": f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"',
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": UPLOADS_CACHE_CONTROL,
+    }
+    
+    if _is_not_modified(request, cache_headers["ETag"], stat_result.st_mtime):
+        return Response(status_code=304, headers=cache_headers)
+    
+    response = build_file_response(str(full_path), stat_result=stat_result)
+    response.headers.update(cache_headers)
+    return response
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from ..database import get_db
+from ..database import get_async_db
 from ..models.user import User, UserRole
 from ..schemas.user import UserResponse, UserUpdate
 from ..utils.deps import get_current_active_user, require_admin
+from ..utils.auth import login_user_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -12,32 +14,34 @@ router = APIRouter(prefix="/users", tags=["users"])
 async def get_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_admin)
 ):
     """Get all users (admin only)."""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return [UserResponse.from_orm(user) for user in users]
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    return [UserResponse.from_orm_fast(user) for user in result.scalars()]
 
 @router.get("/profile", response_model=UserResponse)
 async def get_user_profile(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get current user profile."""
-    return UserResponse.from_orm(current_user)
+    return UserResponse.from_orm_fast(current_user)
 
 @router.put("/profile", response_model=UserResponse)
 async def update_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user profile."""
     update_data = user_update.dict(exclude_unset=True)
     
+    user = await db.get(User, current_user.id)
     for field, value in update_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
-    return UserResponse.from_orm(current_user)
\ No newline at end of file
+    await db.commit()
+    login_user_cache.pop(current_user.email)  # Email or profile fields may have changed
+    await db.refresh(user)
+    return UserResponse.from_orm_fast(user)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from ..models.audit_log import AuditAction, AuditEntityType
@@ -19,7 +19,9 @@ class AuditLogResponse(AuditLogBase):
     clinic_id: Optional[int]
     patient_id: Optional[int]
     changes: Optional[Dict[str, Any]]
-    metadata: Optional[Dict[str, Any]]
+    metadata: Optional[Dict[str, Any]] = Field(
+        None, validation_alias=AliasChoices("extra_metadata", "metadata")
+    )
     ip_address: Optional[str]
     user_agent: Optional[str]
     request_path: Optional[str]
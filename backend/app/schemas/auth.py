@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from ..models.user import UserRole
 from typing import Optional
 
@@ -13,4 +13,4 @@ class RegisterRequest(BaseModel):
     last_name: str
     role: UserRole
     clinic_name: Optional[str] = None  # Required if role is clinic_admin
-    clinic_license: Optional[str] = None  # Required if role is clinic_admin
\ No newline at end of file
+    clinic_license: Optional[str] = Field(None, max_length=32)  # Required if role is clinic_admin
\ No newline at end of file
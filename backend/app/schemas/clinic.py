@@ -1,11 +1,11 @@
-from pydantic import BaseModel, validator
-from typing import Optional, List, Dict
+from pydantic import BaseModel, Field, validator
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from ..utils.validators import SecurityValidatorMixin, SecureTextValidator
 
 class ClinicBase(BaseModel, SecurityValidatorMixin):
     name: str
-    license_number: str
+    license_number: str = Field(..., max_length=32)
     address: Optional[str] = None
     phone: Optional[str] = None
     email: Optional[str] = None
@@ -54,7 +54,7 @@ class ClinicDashboardStats(BaseModel):
     processing_queue: int
     recent_activity: List[Dict]
     popular_document_types: Dict[str, int]
-    patient_demographics: Dict[str, any]
+    patient_demographics: Dict[str, Any]
     system_alerts: List[Dict]
 
 class ClinicOverview(BaseModel):
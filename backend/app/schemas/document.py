@@ -77,6 +77,27 @@ class DocumentResponse(DocumentBase):
     
     class Config:
         from_attributes = True
+    
+    @classmethod
+    def from_orm_fast(cls, document) -> "DocumentResponse":
+        """Build from a loaded Document without re-running the input validators."""
+        return cls.model_construct(
+            id=document.id,
+            original_filename=document.original_filename,
+            document_type=document.document_type,
+            notes=document.notes,
+            patient_id=document.patient_id,
+            clinic_id=document.clinic_id,
+            file_path=document.file_path,
+            mime_type=document.mime_type,
+            file_size=document.file_size,
+            file_hash=None,
+            status=document.status,
+            upload_date=document.upload_date,
+            processed_date=document.processed_date,
+            created_at=document.created_at,
+            updated_at=document.updated_at
+        )
 
 class DocumentDetailResponse(DocumentResponse):
     # Patient information
@@ -112,11 +133,12 @@ class DocumentUploadResponse(BaseModel):
 
 class DocumentListResponse(BaseModel):
     documents: List[DocumentResponse]
-    total: int
+    total: Optional[int] = None  # Only counted when requested with include_total
     page: int
     per_page: int
     has_next: bool
     has_previous: bool
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page
 
 class DocumentSearchRequest(BaseModel, SecurityValidatorMixin):
     query: Optional[str] = None
@@ -303,6 +325,25 @@ class DocumentBatchProcessResponse(BaseModel):
     estimated_completion_time: Optional[datetime] = None
     status_check_url: str
 
+class DocumentBulkOperationRequest(BaseModel):
+    document_ids: List[int]
+    operation: str  # assign, update, delete
+    parameters: Dict[str, Any] = {}
+    
+    @validator('document_ids')
+    def validate_document_ids(cls, v):
+        if not v:
+            raise ValueError('At least one document must be selected')
+        if len(v) > 100:
+            raise ValueError('Cannot operate on more than 100 documents at once')
+        return list(dict.fromkeys(v))
+    
+    @validator('operation')
+    def validate_operation(cls, v):
+        if v not in ['assign', 'update', 'delete']:
+            raise ValueError('Invalid bulk operation')
+        return v
+
 class DocumentAnalyticsRequest(BaseModel):
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
@@ -83,9 +83,12 @@ class PatientDetailResponse(PatientResponse):
 
 class PatientListResponse(BaseModel):
     patients: List[PatientDetailResponse]
-    total: int
+    total: Optional[int] = None  # Only counted when requested with include_total
     page: int
     per_page: int
+    has_next: bool
+    has_previous: bool
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page
 
 class PatientSearchRequest(BaseModel, SecurityValidatorMixin):
     query: Optional[str] = None
@@ -60,6 +60,20 @@ class UserResponse(UserBase):
     
     class Config:
         from_attributes = True
+    
+    @classmethod
+    def from_orm_fast(cls, user) -> "UserResponse":
+        """Build from a loaded User without re-running the input validators."""
+        return cls.model_construct(
+            id=user.id,
+            email=user.email.lower(),
+            first_name=user.first_name,
+            last_name=user.last_name,
+            role=user.role,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            created_at=user.created_at
+        )
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -1,4 +1,7 @@
-from .auth import create_access_token, verify_token, get_password_hash, verify_password
+from .auth import (
+    create_access_token, verify_token, get_password_hash, verify_password,
+    get_password_hash_async, verify_password_async
+)
 from .deps import get_current_user, get_current_active_user
 
 __all__ = [
@@ -6,6 +9,8 @@ __all__ = [
     "verify_token", 
     "get_password_hash", 
     "verify_password",
+    "get_password_hash_async",
+    "verify_password_async",
     "get_current_user",
     "get_current_active_user"
 ]
\ No newline at end of file
@@ -1,17 +1,142 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
 from fastapi import Request
-from typing import Optional, Dict, Any, Union
-from datetime import datetime
+from typing import Optional, Dict, Any, List, Set, Union
+from datetime import datetime, timezone
+import asyncio
 import json
+import logging
 
 from ..models.audit_log import AuditLog, AuditAction, AuditEntityType
 from ..models.user import User
-from ..database import get_db
+from ..database import get_db, SessionLocal
+from .security import get_client_ip
 
-class AuditLogger:
-    def __init__(self, db: Session):
-        self.db = db
+logger = logging.getLogger(__name__)
+
+# Background writer settings: flush after this many rows or this many seconds
+AUDIT_QUEUE_MAXSIZE = 10_000
+AUDIT_BATCH_SIZE = 500
+AUDIT_BATCH_TIMEOUT = 0.2
+
+_audit_queue: Optional[asyncio.Queue] = None
+_audit_loop: Optional[asyncio.AbstractEventLoop] = None
+_audit_task: Optional[asyncio.Task] = None
+
+# Fallback writes handed to the executor, kept so shutdown can wait for them
+_pending_writes: Set[asyncio.Future] = set()
+
+def _write_audit_rows(rows: List[Dict[str, Any]]) -> None:
+    """Insert a batch of audit rows in a single executemany."""
+    db = SessionLocal()
+    try:
+        db.execute(insert(AuditLog), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Failed to write %d audit logs; the batch is dropped", len(rows))
+    finally:
+        db.close()
+
+def _write_audit_rows_off_loop(rows: List[Dict[str, Any]]) -> None:
+    """Write audit rows directly, in a worker thread when called on the event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Already off the event loop (threadpool endpoint or script)
+        _write_audit_rows(rows)
+        return
+    
+    _write_in_executor(loop, rows)
+
+def _write_in_executor(loop: asyncio.AbstractEventLoop, rows: List[Dict[str, Any]]) -> None:
+    """Write audit rows in a worker thread, tracked until the write finishes."""
+    future = loop.run_in_executor(None, _write_audit_rows, rows)
+    _pending_writes.add(future)
+    future.add_done_callback(_finish_pending_write)
+
+def _finish_pending_write(future: asyncio.Future) -> None:
+    _pending_writes.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Audit write failed", exc_info=future.exception())
+
+async def _drain_audit_queue(queue: asyncio.Queue) -> None:
+    """Collect queued audit rows into batches and write them off the event loop."""
+    loop = asyncio.get_running_loop()
+    stopping = False
+    
+    while not stopping:
+        row = await queue.get()
+        if row is None:
+            break
+        batch = [row]
+        
+        # Gather more rows until the batch is full or the timeout passes
+        deadline = loop.time() + AUDIT_BATCH_TIMEOUT
+        while len(batch) < AUDIT_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                stopping = True
+                break
+            batch.append(row)
+        
+        await asyncio.to_thread(_write_audit_rows, batch)
+
+async def start_audit_writer() -> None:
+    """Start the background audit writer (called from the app lifespan)."""
+    global _audit_queue, _audit_loop, _audit_task
+    _audit_queue = asyncio.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+    _audit_loop = asyncio.get_running_loop()
+    _audit_task = asyncio.create_task(_drain_audit_queue(_audit_queue))
+
+async def stop_audit_writer() -> None:
+    """Flush queued audit rows and stop the background writer."""
+    global _audit_queue, _audit_loop, _audit_task
+    if _audit_task is None:
+        return
     
+    # Rows queued before the sentinel are still written, as are fallback
+    # writes already handed to the executor
+    await _audit_queue.put(None)
+    await _audit_task
+    if _pending_writes:
+        await asyncio.gather(*_pending_writes, return_exceptions=True)
+    _audit_queue = _audit_loop = _audit_task = None
+
+def _enqueue_audit_row(row: Dict[str, Any]) -> bool:
+    """Queue an audit row for the background writer; False if it isn't available."""
+    queue, loop = _audit_queue, _audit_loop
+    if queue is None or loop is None:
+        return False
+    
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    
+    if running_loop is loop:
+        try:
+            queue.put_nowait(row)
+        except asyncio.QueueFull:
+            return False
+        return True
+    
+    # Called from a threadpool endpoint: hand the row to the loop thread
+    def put():
+        try:
+            queue.put_nowait(row)
+        except asyncio.QueueFull:
+            _write_in_executor(loop, [row])
+    
+    loop.call_soon_threadsafe(put)
+    return True
+
+class AuditLogger:
     def log(
         self,
         action: AuditAction,
@@ -27,8 +152,8 @@ class AuditLogger:
         request: Optional[Request] = None,
         success: bool = True,
         error_message: Optional[str] = None
-    ) -> AuditLog:
-        """Create an audit log entry."""
+    ) -> None:
+        """Queue an audit log entry for the background writer."""
         
         # Get request information
         ip_address = None
@@ -36,12 +161,15 @@ class AuditLogger:
         request_path = None
         
         if request:
-            ip_address = self._get_client_ip(request)
+            ip_address = get_client_ip(request)
             user_agent = request.headers.get("User-Agent", "")[:500]  # Limit length
             request_path = str(request.url.path)
         
-        # Create audit log entry
-        audit_log = AuditLog(
+        # Build audit log row
+        row = dict(
+            # Stamped now rather than by the server default at insert time, which
+            # can be a batch (or a backlog) later and picks the row's partition
+            created_at=datetime.now(timezone.utc),
             user_id=user.id if user else None,
             user_email=user.email if user else None,
             user_role=user.role.value if user else None,
@@ -53,7 +181,7 @@ class AuditLogger:
             patient_id=patient_id,
             description=description,
             changes=changes,
-            metadata=metadata,
+            extra_metadata=metadata,
             ip_address=ip_address,
             user_agent=user_agent,
             request_path=request_path,
@@ -61,33 +189,11 @@ class AuditLogger:
             error_message=error_message
         )
         
-        try:
-            self.db.add(audit_log)
-            self.db.commit()
-            self.db.refresh(audit_log)
-            return audit_log
-        except Exception as e:
-            self.db.rollback()
-            print(f"Failed to create audit log: {str(e)}")
-            return audit_log  # Return without saving
+        # Write directly only when the background writer isn't running or is
+        # full, and never with a blocking insert on the event loop
+        if not _enqueue_audit_row(row):
+            _write_audit_rows_off_loop([row])
     
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        # Check for forwarded headers (when behind proxy)
-        forwarded_for = request.headers.get('X-Forwarded-For')
-        if forwarded_for:
-            return forwarded_for.split(',')[0].strip()
-        
-        real_ip = request.headers.get('X-Real-IP')
-        if real_ip:
-            return real_ip
-        
-        # Fallback to direct connection
-        if hasattr(request.client, 'host'):
-            return request.client.host
-        
-        return "unknown"
-
     def log_user_action(
         self,
         action: AuditAction,
@@ -154,9 +260,9 @@ class AuditLogger:
         )
 
 # Helper function to get audit logger
-def get_audit_logger(db: Session) -> AuditLogger:
+def get_audit_logger() -> AuditLogger:
     """Get an AuditLogger instance."""
-    return AuditLogger(db)
+    return AuditLogger()
 
 # Decorator for automatic audit logging
 def audit_action(
@@ -1,39 +1,95 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
+import asyncio
+import calendar
+import hashlib
+import hmac
+import secrets
+import orjson
+from jose import JWTError, jwk, jws, jwt
 from passlib.context import CryptContext
-from ..config import settings
+from ..config import get_settings
+from .cache import TTLCache
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# email -> (UserResponse, patient id) for repeat logins; credentials and the
+# active flag are not cached, since other workers can't drop stale entries
+login_user_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# (stored hash, keyed password digest) -> True for recently verified logins.
+# Process-local and short-lived; keying on the stored hash means a password
+# change invalidates its entries, and only successful checks are remembered
+# so wrong guesses always pay the full bcrypt cost
+_verified_password_cache = TTLCache(maxsize=10_000, ttl=60)
+_password_digest_key = secrets.token_bytes(32)
+
+# Password hashing (bcrypt cost comes from settings)
+@lru_cache(maxsize=1)
+def _get_pwd_context() -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=get_settings().bcrypt_rounds)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Generate password hash."""
-    return pwd_context.hash(password)
+    return _get_pwd_context().hash(password)
+
+@lru_cache(maxsize=1)
+def get_dummy_password_hash() -> str:
+    """Hash verified for unknown users so failed logins take the same time."""
+    return get_password_hash("dummy-password-for-timing")
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in a worker thread so bcrypt doesn't block the event loop."""
+    # HMAC with a per-process key so the cache never holds a plain password hash
+    digest = hmac.new(_password_digest_key, plain_password.encode(), hashlib.sha256).digest()
+    cache_key = (hashed_password, digest)
+    if _verified_password_cache.get(cache_key):
+        return True
+    
+    verified = await asyncio.to_thread(verify_password, plain_password, hashed_password)
+    if verified:
+        _verified_password_cache.set(cache_key, True)
+    return verified
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in a worker thread so bcrypt doesn't block the event loop."""
+    return await asyncio.to_thread(get_password_hash, password)
+
+@lru_cache(maxsize=1)
+def _get_signing_key():
+    """Build the JWT signing key once instead of on every encode."""
+    settings = get_settings()
+    return jwk.construct(settings.secret_key, settings.algorithm)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token."""
+    settings = get_settings()
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    # Same token jwt.encode would produce, with the claims serialized by orjson
+    to_encode.update({"exp": calendar.timegm(expire.utctimetuple())})
+    encoded_jwt = jws.sign(orjson.dumps(to_encode), _get_signing_key(), algorithm=settings.algorithm)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[str]:
     """Verify JWT token and return email."""
+    claims = verify_token_claims(token)
+    return claims["sub"] if claims else None
+
+def verify_token_claims(token: str) -> Optional[dict]:
+    """Verify JWT token and return its claims, or None if it has no subject."""
+    settings = get_settings()
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None:
             return None
-        return email
+        return payload
     except JWTError:
         return None
\ No newline at end of file
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from typing import Any, Optional, Tuple, Union
+import time
+import orjson
+import redis.asyncio as aioredis
+from ..config import get_settings
+
+# Redis calls sit on request paths (rate limiting, caches), so a stalled
+# server surfaces as a TimeoutError instead of hanging the request
+REDIS_TIMEOUT_SECONDS = 1.0
+
+# Shared async Redis client (created on first use)
+_redis_client: Optional[aioredis.Redis] = None
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Get the shared Redis client, or None when Redis is not configured."""
+    global _redis_client
+    if _redis_client is None:
+        redis_url = get_settings().redis_url
+        if redis_url:
+            _redis_client = aioredis.from_url(
+                redis_url,
+                socket_timeout=REDIS_TIMEOUT_SECONDS,
+                socket_connect_timeout=REDIS_TIMEOUT_SECONDS
+            )
+    return _redis_client
+
+# Per-clinic aggregates are cached briefly and dropped on writes that change them;
+# maps each kind of cached stats to its TTL in seconds
+CLINIC_STATS_TTL = {"dashboard": 30, "analytics": 60}
+
+def _clinic_stats_key(kind: str, clinic_id: int) -> str:
+    return f"{kind}:{clinic_id}"
+
+async def get_cached_clinic_stats(kind: str, clinic_id: int) -> Optional[dict]:
+    """Get cached stats of the given kind for a clinic, if present."""
+    client = get_redis()
+    if client is None:
+        return None
+    
+    payload = await client.get(_clinic_stats_key(kind, clinic_id))
+    return orjson.loads(payload) if payload else None
+
+async def set_cached_clinic_stats(kind: str, clinic_id: int, stats: dict) -> None:
+    """Cache stats of the given kind for a clinic."""
+    client = get_redis()
+    if client is not None:
+        await client.setex(_clinic_stats_key(kind, clinic_id), CLINIC_STATS_TTL[kind], orjson.dumps(stats))
+
+async def invalidate_clinic_stats(clinic_id: int) -> None:
+    """Drop every kind of cached stats for a clinic."""
+    client = get_redis()
+    if client is not None:
+        await client.delete(*(_clinic_stats_key(kind, clinic_id) for kind in CLINIC_STATS_TTL))
+
+# Patient dashboard responses are cached as ready-to-send JSON and dropped
+# when the patient's profile or documents change; maps each kind to its TTL
+# in seconds. Monthly stats only otherwise change when the month rolls over.
+PATIENT_DASHBOARD_TTL = {"dashboard": 30, "stats": 3600}
+
+def _patient_dashboard_key(kind: str, patient_id: int) -> str:
+    return f"patient_{kind}:{patient_id}"
+
+async def get_cached_patient_dashboard(kind: str, patient_id: int) -> Optional[bytes]:
+    """Get a patient's cached dashboard JSON of the given kind, if present."""
+    client = get_redis()
+    if client is None:
+        return None
+    
+    return await client.get(_patient_dashboard_key(kind, patient_id))
+
+async def set_cached_patient_dashboard(
+    kind: str, patient_id: int, payload: Union[str, bytes], ttl: Optional[int] = None
+) -> None:
+    """Cache a patient's dashboard JSON of the given kind, for at most the kind's TTL."""
+    client = get_redis()
+    if client is not None:
+        ttl = min(ttl, PATIENT_DASHBOARD_TTL[kind]) if ttl else PATIENT_DASHBOARD_TTL[kind]
+        await client.setex(_patient_dashboard_key(kind, patient_id), ttl, payload)
+
+async def invalidate_patient_dashboard(*patient_ids: Optional[int]) -> None:
+    """Drop every cached dashboard kind for the given patients; None ids are skipped."""
+    client = get_redis()
+    keys = [
+        _patient_dashboard_key(kind, patient_id)
+        for patient_id in set(patient_ids) if patient_id is not None
+        for kind in PATIENT_DASHBOARD_TTL
+    ]
+    if client is not None and keys:
+        await client.delete(*keys)
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after `ttl` seconds."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Any, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def pop(self, key: Any) -> None:
+        self._data.pop(key, None)
@@ -0,0 +1,33 @@
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import and_, case, func
+from ..models.patient import Patient
+
+# Age buckets are (label, oldest age in the bucket); the last bucket is open-ended
+AgeBuckets = Sequence[Tuple[str, Optional[int]]]
+
+def years_ago(today: date, years: int) -> date:
+    """Same calendar day `years` years before today (Feb 29 falls back to Feb 28)."""
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        return today.replace(year=today.year - years, day=28)
+
+def age_bucket_columns(buckets: AgeBuckets, today: Optional[date] = None) -> List:
+    """Labelled patient counts per age bucket, for use in a single aggregate select."""
+    # A patient is at most N years old when born after the day N+1 years ago,
+    # so each age bucket becomes a birth-date range counted in SQL
+    today = today or date.today()
+    columns = []
+    newer_cutoff = None
+    for label, max_age in buckets:
+        conditions = []
+        if max_age is not None:
+            older_cutoff = years_ago(today, max_age + 1)
+            conditions.append(Patient.date_of_birth > older_cutoff)
+        if newer_cutoff is not None:
+            conditions.append(Patient.date_of_birth <= newer_cutoff)
+        columns.append(func.count(case((and_(*conditions), 1))).label(label))
+        if max_age is not None:
+            newer_cutoff = older_cutoff
+    return columns
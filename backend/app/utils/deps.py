@@ -1,10 +1,16 @@
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from typing import Optional
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models.user import User, UserRole
-from ..utils.auth import verify_token
+from ..models.clinic import Clinic
+from ..models.patient import Patient
+from ..utils.auth import verify_token_claims
+from ..utils.cache import TTLCache
 
 security = HTTPBearer()
 
@@ -20,14 +26,19 @@ def get_current_user(
     )
     
     token = credentials.credentials
-    email = verify_token(token)
-    if email is None:
+    claims = verify_token_claims(token)
+    if claims is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    # The clinic the user administers comes back in the same query, so routers
+    # read current_user.clinic instead of looking it up again
+    user = db.query(User).options(joinedload(User.clinic)).filter(User.email == claims["sub"]).first()
     if user is None:
         raise credentials_exception
     
+    # A patient's own patient id is signed into the token at login
+    user.patient_id = claims.get("patient_id")
+    
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -47,7 +58,64 @@ def require_role(allowed_roles: list[UserRole]):
         return current_user
     return role_checker
 
+def get_patient_id(db: Session, current_user: User) -> Optional[int]:
+    """Return the current patient's id, from the token when login resolved it."""
+    patient_id = getattr(current_user, "patient_id", None)
+    if patient_id is None:
+        # Tokens issued before the patient profile was linked don't carry it
+        patient_id = db.scalar(select(Patient.id).where(Patient.user_id == current_user.id).limit(1))
+    return patient_id
+
 # Common role dependencies
 require_admin = require_role([UserRole.ADMIN])
 require_clinic_access = require_role([UserRole.ADMIN, UserRole.CLINIC_ADMIN, UserRole.CLINIC_STAFF])
-require_patient = require_role([UserRole.PATIENT])
\ No newline at end of file
+require_patient = require_role([UserRole.PATIENT])
+
+@dataclass
+class ClinicContext:
+    """Authenticated clinic user and the clinic they administer."""
+    user: User
+    clinic: Clinic
+
+def get_clinic_context(
+    current_user: User = Depends(require_clinic_access)
+) -> ClinicContext:
+    """Resolve the current user's clinic once per request."""
+    # get_current_user already loaded the clinic alongside the user
+    clinic = current_user.clinic
+    if not clinic:
+        raise HTTPException(status_code=404, detail="Clinic not found")
+    
+    return ClinicContext(user=current_user, clinic=clinic)
+
+# Each patient user's patient record ids, reused for 30 seconds so patient
+# endpoints don't look the record up on every request
+_patient_identity_cache = TTLCache(maxsize=10_000, ttl=30)
+
+@dataclass
+class PatientContext:
+    """Authenticated patient user and the ids of their patient record."""
+    user: User
+    patient_id: int
+    hospital_patient_id: Optional[str]
+
+async def get_patient_context(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> PatientContext:
+    """Resolve the current patient's record, from cache when recently seen."""
+    if current_user.role != UserRole.PATIENT:
+        raise HTTPException(status_code=403, detail="Access denied - patients only")
+    
+    identity = _patient_identity_cache.get(current_user.id)
+    if identity is None:
+        result = await db.execute(
+            select(Patient.id, Patient.patient_id).where(Patient.user_id == current_user.id)
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Patient profile not found")
+        identity = tuple(row)
+        _patient_identity_cache.set(current_user.id, identity)
+    
+    return PatientContext(current_user, *identity)
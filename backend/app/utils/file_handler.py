@@ -1,13 +1,17 @@
 import os
 import uuid
 import shutil
+import asyncio
 from typing import Optional, Tuple, Dict, Any, List
 from fastapi import UploadFile, HTTPException
+from fastapi.responses import FileResponse, Response
 from pathlib import Path
+from urllib.parse import quote
 import hashlib
 import logging
 from datetime import datetime
-from .security import scan_file_content, sanitize_filename, get_file_mime_type
+from .security import scan_file_content, sanitize_filename, get_file_mime_type, get_buffer_mime_type
+from ..config import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -26,14 +30,34 @@ ALLOWED_MIME_TYPES = {
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     "application/msword"
 }
+ACCEL_REDIRECT_MIN_SIZE = 64 * 1024  # Smaller files are cheaper to send inline
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Uploads are copied and hashed 1 MiB at a time
 
-# Create upload directory structure
-UPLOAD_DIR.mkdir(exist_ok=True)
-(UPLOAD_DIR / "documents").mkdir(exist_ok=True)
-(UPLOAD_DIR / "temp").mkdir(exist_ok=True)
-(UPLOAD_DIR / "quarantine").mkdir(exist_ok=True)
-(UPLOAD_DIR / "deleted").mkdir(exist_ok=True)
-(UPLOAD_DIR / "backups").mkdir(exist_ok=True)
+# Extensions whose content type is checked against the file's magic bytes
+EXPECTED_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+}
+
+UPLOAD_SUBDIRS = ("documents", "temp", "quarantine", "deleted", "backups")
+
+def ensure_upload_dirs() -> List[Tuple[str, bool, Optional[str]]]:
+    """Create the upload directory structure (called once at startup).
+    
+    Returns (path, ok, error) per directory so the caller can log them in one line.
+    """
+    results = []
+    for subdir in UPLOAD_SUBDIRS:
+        path = UPLOAD_DIR / subdir
+        try:
+            os.makedirs(path, exist_ok=True)
+            results.append((str(path), True, None))
+        except OSError as e:
+            results.append((str(path), False, str(e)))
+    return results
 
 def enhanced_file_validation(file: UploadFile) -> Dict[str, Any]:
     """Enhanced file validation with security checks."""
@@ -76,16 +100,8 @@ def enhanced_file_validation(file: UploadFile) -> Dict[str, Any]:
             f"MIME type {file.content_type} not in whitelist"
         )
     
-    # Create hash of file content for duplicate detection
-    try:
-        file.file.seek(0)
-        content = file.file.read()
-        file_hash = hashlib.sha256(content).hexdigest()
-        validation_result["file_hash"] = file_hash
-        file.file.seek(0)  # Reset file pointer
-    except Exception as e:
-        validation_result["warnings"].append(f"Could not hash file: {str(e)}")
-    
+    # The content hash (for duplicate detection) is filled in while the
+    # upload is streamed to disk, so the file isn't read into memory here
     return validation_result
 
 def quarantine_file(file_path: str, reason: str) -> str:
@@ -102,6 +118,12 @@ def quarantine_file(file_path: str, reason: str) -> str:
 
 async def secure_save_upload_file(file: UploadFile) -> Tuple[str, str, int, Dict[str, Any]]:
     """Securely save uploaded file with enhanced validation and scanning."""
+    # Copying, hashing and scanning are blocking file I/O; run them in a worker
+    # thread so a large upload doesn't stall every other request on the loop
+    return await asyncio.to_thread(_secure_save_upload_file_sync, file)
+
+def _secure_save_upload_file_sync(file: UploadFile) -> Tuple[str, str, int, Dict[str, Any]]:
+    """Blocking body of secure_save_upload_file."""
     
     # Validate file
     validation = enhanced_file_validation(file)
@@ -113,16 +135,52 @@ async def secure_save_upload_file(file: UploadFile) -> Tuple[str, str, int, Dict
     temp_path = UPLOAD_DIR / "temp" / unique_filename
     final_path = UPLOAD_DIR / "documents" / unique_filename
     
-    # Save to temporary location first
+    file_ext = Path(validation['sanitized_filename']).suffix.lower()
+    expected_mime = EXPECTED_MIME_TYPES.get(file_ext)
+    
+    # Stream to a temporary location first, hashing and sizing as we go so
+    # memory use stays at one chunk whatever the file size
     try:
+        digest = hashlib.sha256()
+        file_size = 0
+        actual_mime = None
+        file.file.seek(0)
         with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                # Sniff the type from the first chunk; content that doesn't
+                # match its extension stops here instead of being written in full
+                if actual_mime is None:
+                    actual_mime = get_buffer_mime_type(chunk)
+                    if expected_mime and actual_mime != expected_mime:
+                        buffer.write(chunk)  # Kept for the quarantine record
+                        break
+                
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large. Maximum size is {MAX_FILE_SIZE // 1024 // 1024}MB"
+                    )
+                digest.update(chunk)
+                buffer.write(chunk)
+        
+        if actual_mime is None:
+            actual_mime = get_buffer_mime_type(b"")
+        
+        # Verify MIME type matches extension
+        if expected_mime and actual_mime != expected_mime:
+            quarantine_path = quarantine_file(str(temp_path), f"MIME type mismatch: {actual_mime}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"File content doesn't match extension. Expected {expected_mime}, got {actual_mime}"
+            )
         
-        # Get file size
-        file_size = temp_path.stat().st_size
+        validation["file_hash"] = digest.hexdigest()
         
         # Perform security scan
-        security_scan = scan_file_content(str(temp_path))
+        security_scan = scan_file_content(
+            str(temp_path), file_hash=validation["file_hash"], mime_type=actual_mime
+        )
         
         # Check if file passed security scan
         if not security_scan["safe"]:
@@ -132,24 +190,6 @@ async def secure_save_upload_file(file: UploadFile) -> Tuple[str, str, int, Dict
                 detail=f"File failed security scan: {'; '.join(security_scan['issues'])}"
             )
         
-        # Verify MIME type matches extension
-        actual_mime = get_file_mime_type(str(temp_path))
-        expected_mimes = {
-            '.pdf': 'application/pdf',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-        }
-        
-        file_ext = Path(validation['sanitized_filename']).suffix.lower()
-        if file_ext in expected_mimes and actual_mime != expected_mimes[file_ext]:
-            quarantine_path = quarantine_file(str(temp_path), f"MIME type mismatch: {actual_mime}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"File content doesn't match extension. Expected {expected_mimes[file_ext]}, got {actual_mime}"
-            )
-        
         # Move to final location
         shutil.move(temp_path, final_path)
         
@@ -200,6 +240,42 @@ async def save_upload_file(file: UploadFile, destination_path: Optional[str] = N
         logger.error(f"Failed to save file: {str(e)}")
         raise
 
+def build_file_response(
+    file_path: str,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+    stat_result: Optional[os.stat_result] = None
+) -> Response:
+    """
+    Build a response that streams a stored file to the client.
+    
+    When an nginx internal location is configured, files above
+    ACCEL_REDIRECT_MIN_SIZE are served by nginx via X-Accel-Redirect so the
+    bytes go out with sendfile instead of through the Python worker.
+    """
+    if stat_result is None:
+        stat_result = os.stat(file_path)
+    
+    prefix = get_settings().uploads_accel_redirect_prefix
+    if prefix and stat_result.st_size >= ACCEL_REDIRECT_MIN_SIZE:
+        try:
+            relative_path = Path(file_path).resolve().relative_to(UPLOAD_DIR.resolve())
+        except ValueError:
+            relative_path = None  # Outside the uploads directory, serve it ourselves
+        
+        if relative_path is not None:
+            headers = {"X-Accel-Redirect": f"{prefix.rstrip('/')}/{quote(relative_path.as_posix())}"}
+            if filename:
+                headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+            return Response(headers=headers, media_type=media_type)
+    
+    return FileResponse(
+        path=file_path,
+        filename=filename,
+        media_type=media_type,
+        stat_result=stat_result
+    )
+
 def delete_file(file_path: str, soft_delete: bool = True, backup: bool = True) -> bool:
     """
     Delete file with safety options.
@@ -550,7 +626,7 @@ def get_storage_stats() -> Dict[str, Any]:
         }
         
         # Analyze each directory
-        for subdir in ['documents', 'temp', 'quarantine', 'deleted', 'backups']:
+        for subdir in UPLOAD_SUBDIRS:
             dir_path = UPLOAD_DIR / subdir
             if dir_path.exists():
                 dir_files = 0
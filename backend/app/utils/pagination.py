@@ -0,0 +1,22 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Tuple
+import orjson
+from fastapi import HTTPException, status
+
+# Keyset pagination: a cursor is the (timestamp, id) of the last row on the
+# previous page, encoded so clients treat it as opaque
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encode the sort key of the last row on a page."""
+    payload = orjson.dumps([timestamp.isoformat(), row_id])
+    return urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_cursor, rejecting anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = orjson.loads(urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
@@ -7,8 +7,11 @@ from typing import Optional, Dict, Any, List
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPBearer
 import time
+import uuid
 from collections import defaultdict
 import threading
+from .cache import get_redis
+from ..config import get_settings
 
 # Rate limiting
 class RateLimiter:
@@ -37,6 +40,51 @@ class RateLimiter:
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
+# Sliding-window check executed atomically inside Redis.
+# KEYS[1] = bucket key, ARGV = now_ms, window_ms, max_requests, member
+# (the member is unique per request: Lua's math.random is reseeded
+# identically on every call before Redis 7, so it can't be generated here)
+SLIDING_WINDOW_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, ARGV[1] - ARGV[2])
+local n = redis.call('ZCARD', KEYS[1])
+if n >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+class RedisRateLimiter:
+    """Rate limiter shared by all workers, backed by a Redis sorted set per bucket."""
+    
+    def __init__(self, client):
+        # register_script precomputes the SHA1 and calls EVALSHA,
+        # loading the script only if Redis doesn't have it cached yet
+        self.script = client.register_script(SLIDING_WINDOW_SCRIPT)
+    
+    async def is_allowed(
+        self, identifier: str, bucket: str, max_requests: int = 100, window: int = 3600
+    ) -> bool:
+        """Check if request is within rate limit."""
+        now_ms = int(time.time() * 1000)
+        allowed = await self.script(
+            keys=[f"rl:{identifier}:{bucket}"],
+            args=[now_ms, window * 1000, max_requests, uuid.uuid4().hex]
+        )
+        return allowed == 1
+
+_redis_rate_limiter: Optional[RedisRateLimiter] = None
+
+def get_redis_rate_limiter() -> Optional[RedisRateLimiter]:
+    """Get the Redis-backed rate limiter, or None when Redis is not configured."""
+    global _redis_rate_limiter
+    if _redis_rate_limiter is None:
+        client = get_redis()
+        if client is not None:
+            _redis_rate_limiter = RedisRateLimiter(client)
+    return _redis_rate_limiter
+
 # Input sanitization
 def sanitize_text(text: str, max_length: int = 1000) -> str:
     """Sanitize text input to prevent XSS and other attacks."""
@@ -76,7 +124,7 @@ def sanitize_filename(filename: str) -> str:
 def validate_email(email: str) -> bool:
     """Validate email format."""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return len(email) <= 254 and bool(re.match(pattern, email))
 
 def validate_patient_id(patient_id: str) -> bool:
     """Validate patient ID format."""
@@ -88,8 +136,8 @@ def validate_phone(phone: str) -> bool:
     """Validate phone number format."""
     # Remove spaces and common separators
     phone_clean = re.sub(r'[\s\-\(\)\+]', '', phone)
-    # Check if it's numeric and reasonable length
-    return phone_clean.isdigit() and 7 <= len(phone_clean) <= 15
+    # Check if it's numeric and reasonable length (raw value must fit the phone columns)
+    return len(phone) <= 32 and phone_clean.isdigit() and 7 <= len(phone_clean) <= 15
 
 # File security
 def get_file_mime_type(file_path: str) -> str:
@@ -99,7 +147,16 @@ def get_file_mime_type(file_path: str) -> str:
     except Exception:
         return "application/octet-stream"
 
-def scan_file_content(file_path: str) -> Dict[str, Any]:
+def get_buffer_mime_type(data: bytes) -> str:
+    """Get MIME type of in-memory content (e.g. an upload's first chunk)."""
+    try:
+        return magic.from_buffer(data, mime=True)
+    except Exception:
+        return "application/octet-stream"
+
+def scan_file_content(
+    file_path: str, file_hash: Optional[str] = None, mime_type: Optional[str] = None
+) -> Dict[str, Any]:
     """Basic file content scanning for security threats."""
     security_report = {
         "safe": True,
@@ -109,13 +166,17 @@ def scan_file_content(file_path: str) -> Dict[str, Any]:
     }
     
     try:
-        # Calculate file hash
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.sha256(f.read()).hexdigest()
-            security_report["file_hash"] = file_hash
+        # Calculate file hash (in chunks) unless the caller already has it
+        if file_hash is None:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            file_hash = digest.hexdigest()
+        security_report["file_hash"] = file_hash
         
-        # Get actual MIME type
-        actual_mime = get_file_mime_type(file_path)
+        # Get actual MIME type unless the caller already sniffed it
+        actual_mime = mime_type or get_file_mime_type(file_path)
         security_report["actual_mime_type"] = actual_mime
         
         # Check for suspicious content in text files
@@ -172,17 +233,35 @@ def validate_sql_input(input_value: Any) -> bool:
 
 def get_client_ip(request: Request) -> str:
     """Get client IP address for rate limiting."""
-    # Check for forwarded headers (when behind proxy)
-    forwarded_for = request.headers.get('X-Forwarded-For')
-    if forwarded_for:
-        return forwarded_for.split(',')[0].strip()
+    # Resolved once per request (normally by CombinedSecurityApp) and kept in
+    # the scope state shared by every caller
+    state = request.scope.setdefault("state", {})
+    client_ip = state.get("client_ip")
+    if client_ip is None:
+        client_ip = resolve_client_ip(request.scope)
+        state["client_ip"] = client_ip
+    return client_ip
+
+def resolve_client_ip(scope) -> str:
+    """Extract client IP address from the raw ASGI headers or connection."""
+    client = scope.get("client")
+    peer = client[0] if client else None
     
-    real_ip = request.headers.get('X-Real-IP')
-    if real_ip:
-        return real_ip
+    # Forwarded headers are set by whoever connects, so they are only
+    # believed when the connection comes from one of our own proxies
+    trusted = get_settings().trusted_proxies
+    if peer is None or peer not in trusted:
+        return peer or "unknown"
     
-    # Fallback to direct connection
-    if hasattr(request.client, 'host'):
-        return request.client.host
+    real_ip = None
+    for name, value in scope.get("headers", ()):
+        if name == b"x-forwarded-for":
+            # Proxies append, so the rightmost hop we don't run is the client
+            hops = [hop.strip() for hop in value.decode("latin-1").split(",")]
+            for hop in reversed(hops):
+                if hop and hop not in trusted:
+                    return hop
+        elif name == b"x-real-ip" and real_ip is None:
+            real_ip = value.decode("latin-1").strip()
     
-    return "unknown"
\ No newline at end of file
+    return real_ip or peer
@@ -0,0 +1,67 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+import pytest_asyncio
+
+# The app targets Postgres (partitioned audit logs, asyncpg), so the tests run
+# against a disposable database given by DATABASE_URL and are skipped without one
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+if not os.environ.get("DATABASE_URL"):
+    collect_ignore_glob = ["test_*.py"]
+
+@pytest.fixture(scope="session")
+def schema():
+    """Create the tables once for the test run."""
+    from app.database import engine, Base
+    from app.models import load_all_models
+    
+    load_all_models()
+    Base.metadata.create_all(bind=engine)
+
+@pytest.fixture
+def db(schema):
+    """Session whose changes, commits included, are rolled back after the test."""
+    from sqlalchemy.orm import Session
+    from app.database import engine
+    
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+@pytest.fixture
+def clinic(db):
+    from app.models.clinic import Clinic
+    
+    clinic = Clinic(name="Test Clinic", license_number="LIC-TEST-1")
+    db.add(clinic)
+    db.flush()
+    return clinic
+
+@pytest_asyncio.fixture
+async def async_db(schema):
+    """Async session whose changes, commits included, are rolled back after the test."""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.database import async_engine
+    
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(
+            bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
+    
+    # Pooled connections belong to this test's event loop
+    await async_engine.dispose()
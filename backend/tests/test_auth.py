@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from app.config import get_settings
+from app.models.user import User, UserRole
+from app.routers.auth import login_json
+from app.schemas.auth import LoginRequest
+from app.utils.auth import get_password_hash, login_user_cache
+
+PASSWORD = "Correct-Horse-9"
+
+@pytest.mark.asyncio
+async def test_deactivated_user_is_refused_despite_cached_login(async_db):
+    user = User(
+        email="deactivated@example.com",
+        hashed_password=get_password_hash(PASSWORD),
+        first_name="Dee",
+        last_name="Activated",
+        role=UserRole.CLINIC_STAFF,
+        is_active=True
+    )
+    async_db.add(user)
+    await async_db.commit()
+    login = LoginRequest(email=user.email, password=PASSWORD)
+    
+    try:
+        # First login succeeds and leaves the user in this worker's cache
+        token = await login_json(login, async_db, get_settings())
+        assert token["access_token"]
+        assert login_user_cache.get(user.email) is not None
+        
+        # Deactivated elsewhere (another worker), so this cache isn't dropped
+        await async_db.execute(update(User).where(User.id == user.id).values(is_active=False))
+        await async_db.commit()
+        
+        with pytest.raises(HTTPException) as refused:
+            await login_json(login, async_db, get_settings())
+        assert refused.value.detail == "Inactive user"
+    finally:
+        login_user_cache.pop(user.email)
@@ -0,0 +1,29 @@
+from app.models.document import Document
+from app.models.extraction import Extraction
+from app.routers.documents import _delete_document_rows
+
+def _add_document(db, clinic, name):
+    document = Document(
+        clinic_id=clinic.id,
+        filename=name,
+        original_filename=name,
+        file_path=f"/tmp/{name}",
+        file_size=10
+    )
+    db.add(document)
+    db.flush()
+    return document
+
+def test_bulk_delete_detaches_extractions(db, clinic):
+    document = _add_document(db, clinic, "with-extraction.pdf")
+    other = _add_document(db, clinic, "plain.pdf")
+    extraction = Extraction(document_id=document.id)
+    db.add(extraction)
+    db.commit()
+    
+    _delete_document_rows(db, [document.id, other.id])
+    db.commit()
+    
+    assert db.query(Document).filter(Document.id.in_([document.id, other.id])).count() == 0
+    db.refresh(extraction)
+    assert extraction.document_id is None
@@ -16,6 +16,9 @@ export default function DocumentList({ patientId, refreshTrigger }: DocumentList
   const [loading, setLoading] = useState(true)
   const [page, setPage] = useState(1)
   const [total, setTotal] = useState(0)
+  const [hasNext, setHasNext] = useState(false)
+  // cursors[i] fetches page i + 1; page 1 needs no cursor
+  const [cursors, setCursors] = useState<Array<string | null>>([null])
   const [selectedDocument, setSelectedDocument] = useState<number | null>(null)
   const [assigningTo, setAssigningTo] = useState<number | null>(null)
 
@@ -29,6 +32,14 @@ export default function DocumentList({ patientId, refreshTrigger }: DocumentList
         per_page: perPage.toString()
       })
       
+      // The total is only counted for the first page
+      const cursor = cursors[page - 1]
+      if (cursor) {
+        params.append('cursor', cursor)
+      } else {
+        params.append('include_total', 'true')
+      }
+      
       if (patientId) {
         params.append('patient_id', patientId.toString())
       }
@@ -38,7 +49,15 @@ export default function DocumentList({ patientId, refreshTrigger }: DocumentList
       })
 
       setDocuments(response.data.documents)
-      setTotal(response.data.total)
+      if (response.data.total !== null) {
+        setTotal(response.data.total)
+      }
+      setHasNext(response.data.has_next)
+      setCursors(prev => {
+        const next = prev.slice(0, page)
+        next[page] = response.data.next_cursor
+        return next
+      })
     } catch (error) {
       toast.error('Failed to fetch documents')
     } finally {
@@ -221,7 +240,7 @@ export default function DocumentList({ patientId, refreshTrigger }: DocumentList
         </div>
 
         {/* Pagination */}
-        {total > perPage && (
+        {(hasNext || page > 1) && (
           <div className="px-4 py-3 bg-gray-50 border-t border-gray-200 sm:px-6">
             <div className="flex items-center justify-between">
               <div className="text-sm text-gray-700">
@@ -237,7 +256,7 @@ export default function DocumentList({ patientId, refreshTrigger }: DocumentList
                 </button>
                 <button
                   onClick={() => setPage(p => p + 1)}
-                  disabled={page * perPage >= total}
+                  disabled={!hasNext}
                   className="px-3 py-1 text-sm border border-gray-300 rounded disabled:opacity-50"
                 >
                   Next
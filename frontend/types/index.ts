@@ -25,16 +25,22 @@ export interface PaginatedResponse<T> {
 
 export interface DocumentListResponse {
   documents: Document[];
-  total: number;
+  total: number | null;
   page: number;
   per_page: number;
+  has_next: boolean;
+  has_previous: boolean;
+  next_cursor: string | null;
 }
 
 export interface PatientListResponse {
   patients: Patient[];
-  total: number;
+  total: number | null;
   page: number;
   per_page: number;
+  has_next: boolean;
+  has_previous: boolean;
+  next_cursor: string | null;
 }
 
 // ... existing types ...